@@ -0,0 +1,179 @@
+"""
+Bulk integrity scan: recompute record hashes for many messages at once.
+
+Messages are streamed joined to their users in one query over a server-side
+cursor, and hashes are recomputed in chunks on a process pool while the next
+chunk is being fetched. Used by GET /audit/verify and runnable as a CLI:
+
+    cd Backend
+    python -m audit_verify --since 2026-01-01 --until 2026-02-01 --user demo_user > mismatches.ndjson
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import AsyncIterator
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from hashing import HASH_VERSION, hash_many
+from db.models import Message, User
+
+AUDIT_CHUNK_SIZE = int(os.getenv("AUDIT_CHUNK_SIZE", "5000"))
+AUDIT_WORKERS = int(os.getenv("AUDIT_WORKERS", str(os.cpu_count() or 1)))
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Shared hashing pool; spawn keeps workers independent of the server's threads."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=AUDIT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def discard_executor(executor: ProcessPoolExecutor):
+    """Drop a broken pool so the next scan starts a fresh one."""
+    global _executor
+    if _executor is executor:
+        _executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def verify_chunk(rows: list) -> list:
+    """Runs in a worker process: (id, external_id, query, reply, record_hash, hash_version, created_at) rows -> mismatches."""
+    by_version = {}
+    for row in rows:
+        by_version.setdefault(row[5] or HASH_VERSION, []).append(row)
+
+    mismatches = []
+    for version, group in by_version.items():
+        recomputed = hash_many(((r[1], r[2], r[3]) for r in group), version)
+        for (message_id, external_id, _, _, record_hash, _, created_at), new_hash in zip(group, recomputed):
+            if new_hash != record_hash:
+                mismatches.append({
+                    "message_id": message_id,
+                    "user_id": external_id,
+                    "created_at": created_at,
+                    "db_hash": record_hash,
+                    "recomputed_hash": new_hash,
+                })
+    return mismatches
+
+
+def scan_query(since: datetime | None = None, until: datetime | None = None, user: str | None = None):
+    stmt = (
+        select(
+            Message.id, User.external_id, Message.query, Message.reply,
+            Message.record_hash, Message.hash_version, Message.created_at,
+        )
+        .join(User, User.id == Message.user_id)
+        .order_by(Message.created_at, Message.id)
+    )
+    if since is not None:
+        stmt = stmt.where(Message.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(Message.created_at < until)
+    if user is not None:
+        stmt = stmt.where(User.external_id == user)
+    return stmt
+
+
+async def verify_messages(
+    session: AsyncSession,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    user: str | None = None,
+    chunk_size: int = AUDIT_CHUNK_SIZE,
+    executor: ProcessPoolExecutor | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Yield one {"type": "mismatch", ...} per bad row, then a {"type": "summary", ...} line,
+    or a {"type": "error", ...} line if a hashing worker died.
+    """
+    executor = executor or get_executor()
+    loop = asyncio.get_running_loop()
+    max_in_flight = 2 * max(1, AUDIT_WORKERS)
+    pending: deque = deque()
+    scanned = mismatched = 0
+    start = time.perf_counter()
+
+    def as_report(mismatch: dict) -> dict:
+        created_at = mismatch["created_at"]
+        return {"type": "mismatch", **mismatch, "created_at": created_at.isoformat() if created_at else None}
+
+    try:
+        result = await session.stream(scan_query(since, until, user).execution_options(yield_per=chunk_size))
+        async for partition in result.partitions(chunk_size):
+            rows = [tuple(row) for row in partition]
+            scanned += len(rows)
+            pending.append(loop.run_in_executor(executor, verify_chunk, rows))
+            # Bounded pipeline: fetch the next chunk while earlier ones hash
+            while len(pending) >= max_in_flight:
+                for mismatch in await pending.popleft():
+                    mismatched += 1
+                    yield as_report(mismatch)
+
+        while pending:
+            for mismatch in await pending.popleft():
+                mismatched += 1
+                yield as_report(mismatch)
+    except BrokenProcessPool as e:
+        # A worker was killed (e.g. out of memory): report it instead of ending the stream silently
+        for future in pending:
+            future.cancel()
+        discard_executor(executor)
+        print("❌ Audit hashing pool broke:", e)
+        yield {"type": "error", "error": f"hashing worker died: {e}", "scanned": scanned, "mismatches": mismatched}
+        return
+
+    seconds = time.perf_counter() - start
+    yield {
+        "type": "summary",
+        "scanned": scanned,
+        "mismatches": mismatched,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(scanned / seconds, 1) if seconds else None,
+    }
+
+
+async def _run_cli(args) -> int:
+    from db.session import AsyncSessionLocal
+
+    summary = {}
+    async with AsyncSessionLocal() as session:
+        async for report in verify_messages(session, args.since, args.until, args.user, args.chunk_size):
+            if report["type"] == "error":
+                print(json.dumps(report), file=sys.stderr)
+                return 2
+            if report["type"] == "summary":
+                summary = report
+            else:
+                print(json.dumps(report, ensure_ascii=False))
+    print(json.dumps(summary), file=sys.stderr)
+    return 1 if summary.get("mismatches") else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify message record hashes in bulk.")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="ISO date/time, inclusive")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="ISO date/time, exclusive")
+    parser.add_argument("--user", help="external user id")
+    parser.add_argument("--chunk-size", type=int, default=AUDIT_CHUNK_SIZE)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_run_cli(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Compares offline generation backends on a fixed prompt set: load time,
+first-token latency, generation throughput and peak RSS.
+
+    cd Backend
+    python -m benchmarks.bench_backends --backends torch,int8,onnx --max-new-tokens 64
+
+Each backend runs in its own subprocess so peak RSS is measured in isolation
+and one backend's allocations don't skew the next. Decoding is greedy so every
+backend does the same amount of work.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+PROMPTS = [
+    "Which crops are best to sow in the monsoon season?",
+    "How much urea should I apply to wheat per acre?",
+    "My tomato leaves have yellow spots, what should I do?",
+    "When should I irrigate mustard in winter?",
+    "How do I control pink bollworm in cotton?",
+    "What is the right spacing for transplanting paddy?",
+    "Is drip irrigation worth it for sugarcane?",
+    "Which fertilizer is good for potato at planting time?",
+]
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def measure(backend_name: str, max_new_tokens: int, batch_size: int) -> dict:
+    """Runs inside the per-backend subprocess."""
+    from chatbot.backends import make_backend
+
+    generation = dict(max_new_tokens=max_new_tokens, do_sample=False)
+    start = time.perf_counter()
+    backend = make_backend(backend_name)
+    load_seconds = time.perf_counter() - start
+    backend.generate_batch(PROMPTS[:1], max_new_tokens=4, do_sample=False)  # warm-up
+
+    first_token = []
+    for prompt in PROMPTS:
+        start = time.perf_counter()
+        first = None
+        # Consume the whole stream so its generate() thread is done before the next prompt
+        for text in backend.stream(prompt, **generation):
+            if text and first is None:
+                first = time.perf_counter() - start
+        if first is not None:
+            first_token.append(first)
+
+    tokens = 0
+    start = time.perf_counter()
+    for i in range(0, len(PROMPTS), batch_size):
+        for reply in backend.generate_batch(PROMPTS[i:i + batch_size], **generation):
+            tokens += len(backend.tokenizer(reply, add_special_tokens=False)["input_ids"])
+    seconds = time.perf_counter() - start
+
+    first_token.sort()
+    return {
+        "backend": backend_name,
+        "load_seconds": round(load_seconds, 2),
+        "first_token_ms_p50": round(1000 * first_token[len(first_token) // 2], 1) if first_token else None,
+        "first_token_ms_max": round(1000 * first_token[-1], 1) if first_token else None,
+        "tokens": tokens,
+        "tokens_per_second": round(tokens / seconds, 1) if seconds else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="torch,int8,onnx")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)  # internal: run one backend and print JSON
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.max_new_tokens, args.batch_size)))
+        return
+
+    results = []
+    for name in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_backends", "--worker", name,
+             "--max-new-tokens", str(args.max_new_tokens), "--batch-size", str(args.batch_size)],
+            capture_output=True, text=True, cwd=os.getcwd(),
+        )
+        if proc.returncode != 0:
+            print(f"❌ {name} failed:\n{proc.stderr.strip()[-2000:]}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"{len(PROMPTS)} prompts, {args.max_new_tokens} new tokens max, batch size {args.batch_size}")
+    header = ("backend", "load s", "1st tok p50 ms", "1st tok max ms", "tokens/s", "peak RSS MB")
+    print("  ".join(f"{h:>14}" for h in header))
+    for r in results:
+        row = (r["backend"], r["load_seconds"], r["first_token_ms_p50"], r["first_token_ms_max"],
+               r["tokens_per_second"], r["peak_rss_mb"])
+        print("  ".join(f"{v!s:>14}" for v in row))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,77 @@
+"""
+Counts SQL statements per /chat request so the write path doesn't regress.
+
+    cd Backend
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.bench_chat_statements --requests 200
+
+Without DATABASE_URL it runs against a throwaway SQLite file. Exits non-zero
+when a warm request (known user) needs more statements than --budget.
+Admission control is off unless ADMISSION_ENABLED is set: a few users sending
+hundreds of requests back to back would otherwise be rate limited (429).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("ADMISSION_ENABLED", "false")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import main
+from db.session import engine
+from ledger.outbox import LEDGER_TARGETS
+
+IGNORED_PREFIXES = ("BEGIN", "COMMIT", "ROLLBACK", "PRAGMA", "SAVEPOINT", "RELEASE")
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--users", type=int, default=10)
+    # One message INSERT; per-message ledger targets add one multi-row outbox INSERT
+    parser.add_argument("--budget", type=int, default=1 + bool(LEDGER_TARGETS),
+                        help="max statements per warm request")
+    args = parser.parse_args()
+
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(IGNORED_PREFIXES):
+            statements.append(statement)
+
+    with TestClient(main.app) as client:
+        run_id = int(time.time())
+        # Cold: first message of each user (user upsert + message insert)
+        statements.clear()
+        for u in range(args.users):
+            client.post("/chat", json={"user_id": f"bench-{run_id}-{u}", "query": "cold", "use_cache": False})
+        cold = len(statements) / args.users
+
+        # Warm: known users, the steady state we care about
+        statements.clear()
+        start = time.perf_counter()
+        for i in range(args.requests):
+            r = client.post(
+                "/chat",
+                json={"user_id": f"bench-{run_id}-{i % args.users}", "query": f"warm {i}", "use_cache": False},
+            )
+            r.raise_for_status()
+        elapsed = time.perf_counter() - start
+        warm = len(statements) / args.requests
+
+    print(f"cold request: {cold:.2f} statements")
+    print(f"warm request: {warm:.2f} statements ({args.requests / elapsed:.1f} req/s)")
+    if warm > args.budget:
+        print(f"❌ warm request exceeds budget of {args.budget} statements")
+        sys.exit(1)
+    print("✅ within budget")
+
+
+if __name__ == "__main__":
+    run()
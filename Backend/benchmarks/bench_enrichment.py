@@ -0,0 +1,75 @@
+"""
+Per-query cost of reply enrichment as the rule count grows.
+
+    cd Backend
+    python -m benchmarks.bench_enrichment --rules 10,100,1000,5000
+
+Compares the indexed engine (one multi-phrase scan + concept->rule
+counting) with the equivalent linear chain that tests every rule's
+keywords with substring checks, as heuristic_enrich used to.
+"""
+import argparse
+import random
+import time
+
+from chatbot.enrichment import RuleSet
+
+CROPS = "wheat rice paddy maize cotton mustard chickpea potato tomato onion sugarcane soybean".split()
+TOPICS = "fertilizer irrigation pest weed seed price storage disease spacing harvest".split()
+QUERIES = [
+    "How much urea should I give my paddy crop?",
+    "When to irrigate wheat after sowing?",
+    "Cotton me keet lag gaya hai kya spray karein?",
+    "Which variety of mustard is good for late sowing?",
+    "What is today's onion price in the mandi?",
+    "टमाटर में रोग का इलाज बताइए",
+]
+
+
+def make_rules(n: int, seed: int = 11):
+    rng = random.Random(seed)
+    concepts = {f"c{i}": [f"term{i}", f"syn{i}"] for i in range(n)}
+    concepts.update({word: [word] for word in CROPS + TOPICS})
+    names = list(concepts)
+    rules = [
+        {"id": f"r{i}", "all": rng.sample(names, rng.choice((1, 2, 2, 3))), "tip": f"tip {i}"}
+        for i in range(n)
+    ]
+    return concepts, rules
+
+
+def linear_tips(concepts, rules, query: str):
+    q = query.lower()
+    return [
+        rule["tip"] for rule in rules
+        if all(any(s in q for s in [c, *concepts.get(c, [])]) for c in rule["all"])
+    ]
+
+
+def per_query_us(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in QUERIES:
+            fn(query)
+    return 1e6 * (time.perf_counter() - start) / (repeat * len(QUERIES))
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", default="10,100,1000,5000")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'rules':>8} {'compile ms':>12} {'indexed µs/query':>18} {'linear µs/query':>17}")
+    for n in [int(x) for x in args.rules.split(",")]:
+        concepts, rules = make_rules(n)
+        start = time.perf_counter()
+        ruleset = RuleSet(concepts, rules)
+        compile_ms = 1000 * (time.perf_counter() - start)
+        indexed = per_query_us(ruleset.match, args.repeat)
+        linear = per_query_us(lambda q: linear_tips(concepts, rules, q), max(1, args.repeat // 20))
+        print(f"{n:>8} {compile_ms:>12.1f} {indexed:>18.1f} {linear:>17.1f}")
+
+
+if __name__ == "__main__":
+    run()
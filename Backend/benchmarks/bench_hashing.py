@@ -0,0 +1,102 @@
+"""
+Micro-benchmark for record hashing: the old per-module implementations
+against hashing.py (single record and hash_many).
+
+    cd Backend
+    python -m benchmarks.bench_hashing --records 20000 --repeat 5
+
+Also checks that the canonical encoder is byte-identical to the legacy
+main.py / chatbot.utils encoding (the one every stored v1 hash uses), and
+exits non-zero if it is not.
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import time
+
+from hashing import canonical_record, hash_many, record_hash
+
+SAMPLE_TEXT = [
+    "Which crop should I sow in kharif?",
+    "गेहूं में पीला रतुआ रोग का इलाज क्या है?",
+    'Use "neem oil" 5 ml/litre\nspray in the evening.',
+    "Paddy, maize, cotton & soybean — check soil moisture first.",
+    "\\path\\with\\backslashes\tand tabs",
+    "\u0000control\u001fchars",
+]
+
+
+# ------------------------------
+# 🧓 Legacy implementations
+# ------------------------------
+def legacy_app_hash(user_id: str, query: str, reply: str) -> str:
+    """main.py / chatbot/utils.py before the shared module (defines v1)."""
+    payload = json.dumps(
+        {"user_id": user_id, "query": query, "reply": reply},
+        ensure_ascii=False, separators=(",", ":"), sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def legacy_hashing_module(user_id: str, query: str, reply: str) -> str:
+    """Old hashing.py: default separators, ASCII escapes. Different bytes, timed for reference."""
+    payload = json.dumps({"user_id": user_id, "query": query, "reply": reply}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_records(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [
+        (f"user_{rng.randrange(10_000)}",
+         " ".join(rng.choices(SAMPLE_TEXT, k=rng.randint(1, 3))),
+         " ".join(rng.choices(SAMPLE_TEXT, k=rng.randint(2, 8))))
+        for _ in range(n)
+    ]
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+
+    expected = [legacy_app_hash(*r) for r in records]
+    if [record_hash(*r) for r in records] != expected or hash_many(records) != expected:
+        print("❌ canonical encoder is not byte-identical to the v1 encoding")
+        sys.exit(1)
+    for user_id, query, reply in records[:100]:
+        assert canonical_record(user_id, query, reply) == json.dumps(
+            {"user_id": user_id, "query": query, "reply": reply},
+            ensure_ascii=False, separators=(",", ":"), sort_keys=True
+        ).encode("utf-8")
+
+    cases = {
+        "legacy main.py/utils (json.dumps)": lambda: [legacy_app_hash(*r) for r in records],
+        "legacy hashing.py (ascii, spaced)": lambda: [legacy_hashing_module(*r) for r in records],
+        "hashing.record_hash": lambda: [record_hash(*r) for r in records],
+        "hashing.hash_many": lambda: hash_many(records),
+    }
+    baseline = None
+    print(f"{args.records} records, best of {args.repeat}")
+    for name, fn in cases.items():
+        seconds = best_of(args.repeat, fn)
+        baseline = baseline or seconds
+        print(f"  {name:<36} {seconds * 1e6 / args.records:7.2f} µs/record  "
+              f"{args.records / seconds:>10,.0f} records/s  x{baseline / seconds:.2f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,107 @@
+"""
+Prefill time saved by reusing the key/value cache of the prompt header
+(and of recurring retrieved contexts) on CPU.
+
+    cd Backend
+    python -m benchmarks.bench_prefix_cache --backend torch --repeat 5
+
+Prompts are built exactly like run_chatbot_pipeline builds them. For each
+one it times the prefill forward pass over the whole prompt against the
+forward pass over only the tokens after the cached prefix (including the
+cost of copying the cached keys/values), then the time to the first new
+token through generate() with the prefix cache off and on.
+"""
+import argparse
+import time
+
+import torch
+
+from chatbot.backends import OFFLINE_MODEL, make_backend
+from chatbot.langchain_orchestrator import _prompt
+
+QUESTIONS = [
+    "Which crops are best to sow in the monsoon season?",
+    "How much urea should I apply to wheat per acre?",
+    "My tomato leaves have yellow spots, what should I do?",
+    "When should I irrigate mustard in winter?",
+    "How do I control pink bollworm in cotton?",
+    "Which fertilizer is good for potato at planting time?",
+]
+
+# Stand-ins for retrieved chunks; popular topics retrieve the same ones again
+CONTEXTS = [
+    "",
+    "Kharif crops such as rice, maize, soybean and groundnut are sown with the onset of the "
+    "monsoon in June-July and harvested in September-October. Transplant paddy seedlings "
+    "at 20x15 cm spacing and keep 5 cm of standing water for the first weeks.",
+    "Apply nitrogen in split doses: half at sowing and the rest at first irrigation. For wheat "
+    "the recommended dose is 120 kg N, 60 kg P2O5 and 40 kg K2O per hectare, adjusted to the soil test.",
+]
+
+
+def median_ms(samples: list) -> float:
+    samples = sorted(samples)
+    return round(1000 * samples[len(samples) // 2], 2)
+
+
+def prefill_seconds(backend, prompt: str, cached: bool) -> tuple:
+    """Seconds for the prefill forward pass, and how many tokens it processed."""
+    ids = backend.tokenizer(prompt, return_tensors="pt")["input_ids"]
+    start = time.perf_counter()
+    with torch.inference_mode():
+        kv = backend._prefix_kv(prompt, ids[0]) if cached else None
+        reused = kv.get_seq_length() if kv is not None else 0
+        backend.model(input_ids=ids[:, reused:].to(backend.model.device), past_key_values=kv, use_cache=True)
+    return time.perf_counter() - start, ids.shape[1] - reused
+
+
+def first_token_seconds(backend, prompt: str) -> float:
+    start = time.perf_counter()
+    backend.generate_batch([prompt], max_new_tokens=1, do_sample=False)
+    return time.perf_counter() - start
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="torch", help="torch | int8 (onnx has no prefix cache)")
+    parser.add_argument("--model", default=OFFLINE_MODEL)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    backend = make_backend(args.backend, args.model)
+    prefix_cache = backend.prefix_cache
+    if prefix_cache is None:
+        raise SystemExit(f"{args.backend} backend has no prefix cache (or PREFIX_CACHE_ENABLED=false)")
+
+    prompts = [_prompt(q, c) for q in QUESTIONS for c in CONTEXTS]
+    for prompt in prompts[:2]:
+        backend._prefix_kv(prompt, backend.tokenizer(prompt, return_tensors="pt")["input_ids"][0])  # warm-up
+
+    full, cached, full_tokens, cached_tokens = [], [], 0, 0
+    for _ in range(args.repeat):
+        for prompt in prompts:
+            seconds, tokens = prefill_seconds(backend, prompt, cached=False)
+            full.append(seconds)
+            full_tokens += tokens
+            seconds, tokens = prefill_seconds(backend, prompt, cached=True)
+            cached.append(seconds)
+            cached_tokens += tokens
+
+    backend.prefix_cache = None
+    ttft_off = [first_token_seconds(backend, p) for p in prompts for _ in range(args.repeat)]
+    backend.prefix_cache = prefix_cache
+    ttft_on = [first_token_seconds(backend, p) for p in prompts for _ in range(args.repeat)]
+
+    runs = len(full)
+    print(f"{args.model} ({args.backend}), {len(prompts)} prompts x {args.repeat}, threads {torch.get_num_threads()}")
+    print(f"  {'':<24} {'no cache':>10} {'prefix cache':>13}")
+    print(f"  {'tokens prefilled / req':<24} {full_tokens / runs:>10.1f} {cached_tokens / runs:>13.1f}")
+    print(f"  {'prefill ms p50':<24} {median_ms(full):>10} {median_ms(cached):>13}")
+    print(f"  {'first token ms p50':<24} {median_ms(ttft_off):>10} {median_ms(ttft_on):>13}")
+    saved = median_ms(full) - median_ms(cached)
+    print(f"\n  prefill saved per request: {saved:.2f} ms ({saved / median_ms(full):.0%})")
+    print(f"  prefix cache: {prefix_cache.stats()}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,95 @@
+"""
+Throughput of the PII / blocklist scrubber on large inputs.
+
+    cd Backend
+    python -m benchmarks.bench_safety_filters --megabytes 4
+
+Compares the old three-pass clean_input with the combined single-pass
+engine, shows how the engine scales with blocklist size, and measures the
+streaming scrubber on token-sized chunks. Also checks that streamed output
+is identical to scrubbing the whole text at once.
+"""
+import argparse
+import random
+import re
+import sys
+import time
+
+from chatbot.safety_filters import PII_RULES, SafetyFilter
+
+WORDS = (
+    "wheat rice paddy urea irrigation monsoon kharif rabi seed mandi price soil pest "
+    "spray neem fertilizer tractor yield acre hectare गेहूं धान सिंचाई खाद बीज"
+).split()
+PII = ["9876543210", "+91 98765 43210", "ABCDE1234F", "1234 5678 9012", "ram.kumar@gmail.com",
+       "123456789012345", "SBIN0001234"]
+
+
+def legacy_clean_input(text: str) -> str:
+    """clean_input before the engine: three separate passes."""
+    text = re.sub(r'\b\d{10}\b', '[PHONE]', text)
+    text = re.sub(r'[A-Z]{5}\d{4}[A-Z]', '[PAN]', text)
+    text = re.sub(r'\b\d{12}\b', '[AADHAAR]', text)
+    return text
+
+
+def make_text(megabytes: float, pii_rate: float = 0.01, seed: int = 3) -> str:
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < megabytes * 1_000_000:
+        token = rng.choice(PII) if rng.random() < pii_rate else rng.choice(WORDS)
+        parts.append(token)
+        size += len(token.encode("utf-8")) + 1
+    return " ".join(parts)
+
+
+def make_blocklist(n: int, seed: int = 5) -> list:
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 12))) for _ in range(n)]
+
+
+def mb_per_second(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return len(text.encode("utf-8")) / 1_000_000 / best
+
+
+def streamed(engine: SafetyFilter, text: str, chunk: int) -> str:
+    scrubber = engine.stream()
+    out = [scrubber.feed(text[i:i + chunk]) for i in range(0, len(text), chunk)]
+    out.append(scrubber.flush())
+    return "".join(out)
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk", type=int, default=6, help="characters per streamed chunk (about one token)")
+    args = parser.parse_args()
+
+    text = make_text(args.megabytes)
+    print(f"{len(text.encode('utf-8')) / 1e6:.1f} MB input, best of {args.repeat}")
+    print(f"  {'legacy clean_input (3 passes, 3 rules)':<44} {mb_per_second(legacy_clean_input, text, args.repeat):8.1f} MB/s")
+
+    for size in (0, 100, 10_000):
+        engine = SafetyFilter(PII_RULES, make_blocklist(size))
+        label = f"engine, {len(PII_RULES)} PII rules + {size} blocklist terms"
+        print(f"  {label:<44} {mb_per_second(engine.scrub, text, args.repeat):8.1f} MB/s")
+
+    engine = SafetyFilter(PII_RULES, make_blocklist(100))
+    sample = text[:500_000]
+    if streamed(engine, sample, args.chunk) != engine.scrub(sample):
+        print("❌ streamed output differs from whole-text scrubbing")
+        sys.exit(1)
+    rate = mb_per_second(lambda t: streamed(engine, t, args.chunk), sample, args.repeat)
+    label = f"streaming, {args.chunk}-char chunks"
+    print(f"  {label:<44} {rate:8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    run()
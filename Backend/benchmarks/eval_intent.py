@@ -0,0 +1,109 @@
+"""
+Offline evaluation of the intent router.
+
+    cd Backend
+    python -m benchmarks.eval_intent
+    python -m benchmarks.eval_intent --traffic queries.txt --sweep
+
+Reports accuracy and per-intent precision/recall on a labelled set, how
+much traffic the templated fast path would answer without the model (and
+how often those templated answers are for the right intent), and
+classification latency. --traffic takes unlabelled queries, one per line
+(e.g. exported from the messages table), to estimate the offloaded share
+on real traffic. --sweep shows the trade-off across INTENT_MIN_SCORE values.
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+from chatbot.intent import INTENT_MIN_MARGIN, INTENT_MIN_SCORE, IntentRouter
+
+EVAL_PATH = os.path.join(os.path.dirname(__file__), "data", "intent_eval.jsonl")
+
+
+def load_labelled(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(router: IntentRouter, labelled: list) -> dict:
+    correct, templated, templated_right = 0, 0, 0
+    predicted, actual, hits = Counter(), Counter(), Counter()
+    for row in labelled:
+        route = router.route(row["query"])
+        predicted[route.intent] += 1
+        actual[row["intent"]] += 1
+        if route.intent == row["intent"]:
+            correct += 1
+            hits[route.intent] += 1
+        if route.reply is not None:
+            templated += 1
+            templated_right += route.intent == row["intent"]
+    return {
+        "accuracy": correct / len(labelled),
+        "templated_share": templated / len(labelled),
+        "templated_precision": templated_right / templated if templated else 1.0,
+        "per_intent": {
+            intent: (hits[intent] / predicted[intent] if predicted[intent] else 0.0,
+                     hits[intent] / actual[intent] if actual[intent] else 0.0, actual[intent])
+            for intent in sorted(set(actual) | set(predicted))
+        },
+    }
+
+
+def latency_us(router: IntentRouter, queries: list, repeat: int = 50) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            router.route(query)
+            timings.append(1e6 * (time.perf_counter() - start))
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.99)]
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=EVAL_PATH, help="labelled JSONL: {\"query\", \"intent\"} per line")
+    parser.add_argument("--traffic", help="unlabelled queries, one per line")
+    parser.add_argument("--min-score", type=float, default=INTENT_MIN_SCORE)
+    parser.add_argument("--min-margin", type=float, default=INTENT_MIN_MARGIN)
+    parser.add_argument("--sweep", action="store_true", help="also evaluate a range of --min-score values")
+    args = parser.parse_args()
+
+    labelled = load_labelled(args.data)
+    router = IntentRouter(min_score=args.min_score, min_margin=args.min_margin, routing=True)
+    result = evaluate(router, labelled)
+
+    print(f"{len(labelled)} labelled queries, min score {args.min_score}, min margin {args.min_margin}")
+    print(f"  accuracy             {result['accuracy']:.1%}")
+    print(f"  templated (no model) {result['templated_share']:.1%}")
+    print(f"  templated precision  {result['templated_precision']:.1%}")
+    p50, p99 = latency_us(router, [row["query"] for row in labelled])
+    print(f"  latency              p50 {p50:.0f} µs, p99 {p99:.0f} µs")
+    print(f"\n  {'intent':<14} {'precision':>10} {'recall':>8} {'support':>8}")
+    for intent, (precision, recall, support) in result["per_intent"].items():
+        print(f"  {intent:<14} {precision:>10.1%} {recall:>8.1%} {support:>8}")
+
+    if args.traffic:
+        with open(args.traffic, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+        routes = [router.route(q) for q in queries]
+        offloaded = sum(r.reply is not None for r in routes)
+        print(f"\n{len(queries)} traffic queries: {offloaded / len(queries):.1%} answered without the model")
+        for intent, count in Counter(r.intent for r in routes).most_common():
+            print(f"  {intent:<14} {count / len(queries):>7.1%}")
+
+    if args.sweep:
+        print(f"\n  {'min score':>9} {'accuracy':>9} {'templated':>10} {'tmpl precision':>15}")
+        for step in range(10, 60, 5):
+            score = step / 100
+            swept = evaluate(IntentRouter(min_score=score, min_margin=args.min_margin, routing=True), labelled)
+            print(f"  {score:>9.2f} {swept['accuracy']:>9.1%} {swept['templated_share']:>10.1%} "
+                  f"{swept['templated_precision']:>15.1%}")
+
+
+if __name__ == "__main__":
+    run()
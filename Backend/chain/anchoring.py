@@ -0,0 +1,156 @@
+import asyncio
+import os
+
+from sqlalchemy import select, update
+
+from chain.merkle import build_tree, merkle_root, merkle_proof, dump_proof, load_proof, verify_proof
+from chain.nonce_manager import nonce_manager_for
+from db.models import AnchorBatch, Message, OutboxEvent
+from ledger.outbox import ANCHORED_TARGETS
+
+# ===============================================================
+# ⚓ Batched Merkle anchoring
+# Unanchored Message.record_hash values are collected over a
+# time/size window, a Merkle tree is built over them and only the
+# root goes on chain, in a single transaction per batch. Each message
+# keeps its batch id and inclusion proof for /audit, and the batch
+# transaction as its polygon_tx_hash (this is how the "polygon"
+# outbox target is delivered).
+# ===============================================================
+
+ANCHOR_ENABLED = os.getenv("ANCHOR_ENABLED", "false").lower() == "true"
+ANCHOR_RPC = os.getenv("ANCHOR_RPC", "polygon")  # polygon | fake
+ANCHOR_BATCH_SIZE = int(os.getenv("ANCHOR_BATCH_SIZE", "1024"))
+ANCHOR_INTERVAL_SECONDS = float(os.getenv("ANCHOR_INTERVAL_SECONDS", "60"))
+
+
+def make_rpc(kind: str = ANCHOR_RPC):
+    if kind == "fake":
+        from chain.fake_rpc import FakePolygonRPC
+        return FakePolygonRPC()
+    from chain.polygon_client import PolygonRPC
+    return PolygonRPC()
+
+
+class AnchorService:
+    def __init__(
+        self,
+        rpc,
+        session_factory,
+        batch_size: int = ANCHOR_BATCH_SIZE,
+        interval_seconds: float = ANCHOR_INTERVAL_SECONDS,
+    ):
+        self.rpc = rpc
+        self.nonces = nonce_manager_for(rpc)
+        self.session_factory = session_factory
+        self.batch_size = max(1, batch_size)
+        self.interval = interval_seconds
+        self._pending = 0
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    # ------------------------------
+    # 🔄 Lifecycle
+    # ------------------------------
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def notify(self, count: int = 1):
+        """Called after new messages are committed; wakes the loop once a batch is full."""
+        self._pending += count
+        if self._pending >= self.batch_size:
+            self._wake.set()
+
+    async def run(self):
+        while True:
+            try:
+                self._wake.clear()
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._pending = 0
+            # Drain full batches back to back, then wait for the next window
+            while True:
+                try:
+                    batch = await self.anchor_once()
+                except Exception as e:
+                    print("⚠️ Anchoring failed, will retry next window:", e)
+                    break
+                if batch is None or batch.size < self.batch_size:
+                    break
+
+    # ------------------------------
+    # 🌳 One batch
+    # ------------------------------
+    async def anchor_once(self) -> AnchorBatch | None:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(Message.id, Message.record_hash)
+                .where(Message.anchor_batch_id.is_(None), Message.record_hash != "")
+                .order_by(Message.created_at)
+                .limit(self.batch_size)
+                # Several workers can run the service without double-anchoring
+                .with_for_update(skip_locked=True)
+            )
+            rows = result.all()
+            if not rows:
+                return None
+
+            levels = build_tree([record_hash for _, record_hash in rows])
+            batch = AnchorBatch(merkle_root=merkle_root(levels), size=len(rows))
+            session.add(batch)
+            await session.flush()
+
+            await session.execute(
+                update(Message),
+                [
+                    {"id": message_id, "anchor_batch_id": batch.id, "merkle_proof": dump_proof(merkle_proof(levels, i))}
+                    for i, (message_id, _) in enumerate(rows)
+                ],
+            )
+
+            # Publish last: if the chain write fails nothing is committed and
+            # the same messages are picked up again next window
+            nonce = self.nonces.allocate()
+            try:
+                batch.polygon_tx_hash = await asyncio.get_running_loop().run_in_executor(
+                    None, self.rpc.send_data_transaction, bytes.fromhex(batch.merkle_root[2:]), nonce
+                )
+            except Exception:
+                self.nonces.resync()
+                await session.rollback()
+                raise
+
+            # The batch transaction is every member's Polygon record
+            await session.execute(
+                update(Message).where(Message.anchor_batch_id == batch.id)
+                .values(polygon_tx_hash=batch.polygon_tx_hash)
+            )
+            await session.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.message_id.in_([message_id for message_id, _ in rows]),
+                       OutboxEvent.target.in_(ANCHORED_TARGETS), OutboxEvent.status != "done")
+                .values(status="done", last_error=None)
+            )
+            await session.commit()
+            print(f"⚓ Anchored {batch.size} messages, root {batch.merkle_root}, tx {batch.polygon_tx_hash}")
+            return batch
+
+
+def verify_anchor(msg: Message, batch: AnchorBatch | None) -> dict | None:
+    """Inclusion check for /audit: does the stored proof lead to the published root?"""
+    if batch is None or not msg.merkle_proof:
+        return None
+    return {
+        "batch_id": batch.id,
+        "merkle_root": batch.merkle_root,
+        "polygon_tx_hash": batch.polygon_tx_hash,
+        "proof_valid": verify_proof(msg.record_hash, load_proof(msg.merkle_proof), batch.merkle_root),
+    }
@@ -0,0 +1,34 @@
+import hashlib
+import os
+import threading
+
+
+class FakePolygonRPC:
+    """
+    In-process stand-in for the Polygon node used by the anchoring service.
+    It enforces strict nonce ordering like a real node and keeps every
+    accepted transaction so tests can inspect what was published.
+    """
+
+    def __init__(self, address: str | None = None, fail_next: int = 0):
+        # A fresh account per instance: nonce managers are shared per address
+        self.address = address or "0x" + os.urandom(20).hex()
+        self.transactions: list[dict] = []
+        self.fail_next = fail_next
+        self._lock = threading.Lock()
+
+    def get_transaction_count(self, address: str) -> int:
+        with self._lock:
+            return sum(1 for tx in self.transactions if tx["from"] == address)
+
+    def send_data_transaction(self, data: bytes, nonce: int) -> str:
+        with self._lock:
+            if self.fail_next:
+                self.fail_next -= 1
+                raise ConnectionError("fake RPC: simulated node failure")
+            expected = sum(1 for tx in self.transactions if tx["from"] == self.address)
+            if nonce != expected:
+                raise ValueError(f"fake RPC: nonce {nonce} rejected, expected {expected}")
+            tx_hash = "0x" + hashlib.sha256(self.address.encode() + nonce.to_bytes(8, "big") + data).hexdigest()
+            self.transactions.append({"from": self.address, "nonce": nonce, "data": data, "hash": tx_hash})
+            return tx_hash
@@ -0,0 +1,66 @@
+import hashlib
+import json
+from typing import List, Tuple
+
+# Domain-separated SHA-256 Merkle tree over Message.record_hash values.
+# Leaves and inner nodes use different prefixes so a leaf can never be
+# passed off as an inner node. An odd node at the end of a level is
+# carried up unchanged (no duplication).
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+ProofStep = Tuple[str, str]  # (side of the sibling: "L" | "R", sibling hash hex)
+
+
+def leaf_hash(record_hash: str) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(record_hash)).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_tree(record_hashes: List[str]) -> List[List[bytes]]:
+    """Return every level of the tree, leaves first and the root level last."""
+    if not record_hashes:
+        raise ValueError("cannot build a Merkle tree with no leaves")
+    levels = [[leaf_hash(h) for h in record_hashes]]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def merkle_root(levels: List[List[bytes]]) -> str:
+    return "0x" + levels[-1][0].hex()
+
+
+def merkle_proof(levels: List[List[bytes]], index: int) -> List[ProofStep]:
+    """Sibling path from leaf `index` up to the root."""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(("L" if sibling < index else "R", level[sibling].hex()))
+        index //= 2
+    return proof
+
+
+def verify_proof(record_hash: str, proof: List[ProofStep], root: str) -> bool:
+    node = leaf_hash(record_hash)
+    for side, sibling_hex in proof:
+        sibling = bytes.fromhex(sibling_hex)
+        node = node_hash(sibling, node) if side == "L" else node_hash(node, sibling)
+    return "0x" + node.hex() == root.lower()
+
+
+def dump_proof(proof: List[ProofStep]) -> str:
+    return json.dumps(proof, separators=(",", ":"))
+
+
+def load_proof(raw: str) -> List[ProofStep]:
+    return [tuple(step) for step in json.loads(raw)]
@@ -0,0 +1,44 @@
+import threading
+
+
+class NonceManager:
+    """
+    Hands out account nonces locally instead of asking the node on every
+    send, so concurrent senders never reuse one. The counter is seeded from
+    the node's pending transaction count and re-synced after a failed send.
+    """
+
+    def __init__(self, rpc):
+        self.rpc = rpc
+        self._lock = threading.Lock()
+        self._next: int | None = None
+
+    def allocate(self) -> int:
+        with self._lock:
+            if self._next is None:
+                self._next = self.rpc.get_transaction_count(self.rpc.address)
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def resync(self):
+        """Forget the local counter; the next allocate() asks the node again."""
+        with self._lock:
+            self._next = None
+
+
+_managers: dict = {}
+_managers_lock = threading.Lock()
+
+
+def nonce_manager_for(rpc) -> NonceManager:
+    """
+    The one NonceManager for rpc's account in this process. Everything that
+    sends from an account (anchoring, direct publishes) must share it, or
+    two counters hand out the same nonces.
+    """
+    with _managers_lock:
+        manager = _managers.get(rpc.address)
+        if manager is None:
+            manager = _managers[rpc.address] = NonceManager(rpc)
+        return manager
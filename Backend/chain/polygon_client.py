@@ -2,6 +2,8 @@ import os, json, hashlib
 from web3 import Web3
 from dotenv import load_dotenv
 
+from chain.nonce_manager import nonce_manager_for
+
 load_dotenv()
 RPC = os.getenv("POLYGON_RPC_URL")
 CHAIN_ID = int(os.getenv("POLYGON_CHAIN_ID", "80002"))
@@ -13,13 +15,8 @@ ACCOUNT = w3.eth.account.from_key(PRIVATE_KEY)
 def keccak256_hex(data: bytes) -> str:
     return "0x" + hashlib.sha3_256(data).hexdigest()
 
-def publish_hash_on_polygon(message_id: str, record_hash: str) -> str:
-    """
-    Minimal pattern: send a bare tx with hash in 'data' field to self,
-    or to an optional logging contract.
-    """
-    nonce = w3.eth.get_transaction_count(ACCOUNT.address)
-    tx = {
+def build_data_tx(record_hash: str, nonce: int) -> dict:
+    return {
         "to": ACCOUNT.address,              # self-transfer; data carries the hash
         "value": 0,
         "data": Web3.to_bytes(hexstr=record_hash),
@@ -30,6 +27,32 @@ def publish_hash_on_polygon(message_id: str, record_hash: str) -> str:
         "chainId": CHAIN_ID,
         "type": 2,
     }
-    signed = ACCOUNT.sign_transaction(tx)
-    tx_hash = w3.eth.send_raw_transaction(signed.rawTransaction).hex()
-    return tx_hash
+
+class PolygonRPC:
+    """RPC surface used by chain.anchoring, backed by the web3 client above."""
+
+    address = ACCOUNT.address
+
+    def get_transaction_count(self, address: str) -> int:
+        # "pending" so transactions still in the mempool are counted
+        return w3.eth.get_transaction_count(address, "pending")
+
+    def send_data_transaction(self, data: bytes, nonce: int) -> str:
+        signed = ACCOUNT.sign_transaction(build_data_tx("0x" + data.hex(), nonce))
+        return w3.eth.send_raw_transaction(signed.rawTransaction).hex()
+
+
+rpc = PolygonRPC()
+nonces = nonce_manager_for(rpc)  # shared with chain.anchoring for the same account
+
+def publish_hash_on_polygon(message_id: str, record_hash: str) -> str:
+    """
+    Minimal pattern: send a bare tx with hash in 'data' field to self,
+    or to an optional logging contract.
+    """
+    nonce = nonces.allocate()
+    try:
+        return rpc.send_data_transaction(Web3.to_bytes(hexstr=record_hash), nonce)
+    except Exception:
+        nonces.resync()
+        raise
@@ -0,0 +1,226 @@
+# backend/chatbot/admission.py
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from chatbot.scheduler import MAX_BATCH_SIZE, WORKERS
+
+# ===============================================================
+# 🚦 Admission control
+# Sits in front of the inference scheduler:
+#   - per-user token buckets (429 when a user sends too fast)
+#   - a fixed number of generation slots; requests beyond that
+#     wait in a bounded priority queue (interactive before batch)
+#   - fail fast with 503 when the queue is full or the expected
+#     wait is longer than the deadline, instead of letting every
+#     request time out. Rejections carry a Retry-After hint.
+# A full queue sheds its lowest-priority, newest waiter to make
+# room for more urgent work.
+# ===============================================================
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Default: as many generations as the scheduler can batch at once
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", str(MAX_BATCH_SIZE * WORKERS)))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "0.5"))  # requests/second; 0 disables
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "10"))
+ADMISSION_MAX_USERS = int(os.getenv("ADMISSION_MAX_USERS", "10000"))
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+class Rejected(Exception):
+    """Request refused by admission control; `status` is 429 or 503."""
+
+    def __init__(self, status: int, reason: str, retry_after: float):
+        super().__init__(f"{reason} (retry after {retry_after:.1f}s)")
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBuckets:
+    """One bucket per key (LRU-bounded); each request takes a token."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_keys = max(1, max_keys)
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (tokens, updated_at)
+
+    def take(self, key: str) -> float:
+        """0 if a token was taken, otherwise seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)  # idle users start over with a full bucket
+        return wait
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_inflight: int = ADMISSION_MAX_INFLIGHT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        max_wait: float = ADMISSION_MAX_WAIT_SECONDS,
+        user_rate: float = ADMISSION_USER_RATE,
+        user_burst: float = ADMISSION_USER_BURST,
+        max_users: int = ADMISSION_MAX_USERS,
+        enabled: bool = ADMISSION_ENABLED,
+    ):
+        self.enabled = enabled
+        self.max_inflight = max(1, max_inflight)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self.buckets = TokenBuckets(user_rate, user_burst, max_users)
+        self._inflight = 0
+        # Heap of [priority, seq, future]; entries whose future is done are stale
+        self._waiters: list = []
+        self._queued = {level: 0 for level in PRIORITIES.values()}
+        self._seq = itertools.count()
+        self._avg_hold = 0.0  # EWMA of seconds a slot is held
+        self.admitted = 0
+        self.rejected = {"rate_limited": 0, "queue_full": 0, "overloaded": 0, "shed": 0, "deadline": 0}
+
+    # ------------------------------
+    # 🪣 Per-user rate limit
+    # ------------------------------
+    def check_user(self, external_id: str):
+        if not self.enabled:
+            return
+        wait = self.buckets.take(external_id)
+        if wait > 0:
+            self.rejected["rate_limited"] += 1
+            raise Rejected(429, "rate_limited", wait)
+
+    # ------------------------------
+    # 🎟️ Generation slots
+    # ------------------------------
+    @property
+    def queue_depth(self) -> int:
+        return sum(self._queued.values())
+
+    def estimated_wait(self, priority: str = "interactive") -> float:
+        """Rough queueing delay for a new request: waiters ahead of it / slots * average hold."""
+        return self._estimated_wait(PRIORITIES[priority])
+
+    def _estimated_wait(self, level: int) -> float:
+        if self._inflight < self.max_inflight and not self.queue_depth:
+            return 0.0
+        ahead = sum(count for lvl, count in self._queued.items() if lvl <= level)
+        return (ahead + 1) / self.max_inflight * self._avg_hold
+
+    def check(self, priority: str = "interactive"):
+        """Fail fast if a request of this priority would be rejected by acquire() right now."""
+        if not self.enabled or (self._inflight < self.max_inflight and not self.queue_depth):
+            return
+        self._reject_if_overloaded(PRIORITIES[priority], shed=False)
+
+    def _reject_if_overloaded(self, level: int, shed: bool):
+        wait = self._estimated_wait(level)
+        if wait > self.max_wait:
+            self.rejected["overloaded"] += 1
+            raise Rejected(503, "overloaded", wait)
+        if self.queue_depth >= self.max_queue:
+            victim = self._lowest_waiter(below=level)
+            if victim is None:
+                self.rejected["queue_full"] += 1
+                raise Rejected(503, "queue_full", max(wait, self._avg_hold))
+            if shed:
+                self._shed(victim)
+
+    def _lowest_waiter(self, below: int):
+        """Newest live waiter with a lower priority than `below` (higher number), if any."""
+        candidates = [e for e in self._waiters if e[0] > below and not e[2].done()]
+        return max(candidates, key=lambda e: (e[0], e[1])) if candidates else None
+
+    def _shed(self, entry: list):
+        self._queued[entry[0]] -= 1
+        self.rejected["shed"] += 1
+        entry[2].set_exception(Rejected(503, "shed", self._avg_hold or 1.0))
+
+    async def acquire(self, priority: str = "interactive"):
+        level = PRIORITIES[priority]
+        if self._inflight < self.max_inflight and not self.queue_depth:
+            self._inflight += 1
+            self.admitted += 1
+            return
+        self._reject_if_overloaded(level, shed=True)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [level, next(self._seq), future])
+        self._queued[level] += 1
+        try:
+            # On success the releasing request hands its slot over (in-flight count unchanged)
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            self._queued[level] -= 1
+            self.rejected["deadline"] += 1
+            raise Rejected(503, "deadline", self._estimated_wait(level))
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._release()  # slot was handed over just as the caller went away
+            elif not future.done() or future.cancelled():
+                self._queued[level] -= 1
+            raise
+        self.admitted += 1
+
+    def _release(self):
+        while self._waiters:
+            level, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # timed out, cancelled or shed
+            self._queued[level] -= 1
+            future.set_result(None)
+            return
+        self._inflight -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "interactive"):
+        """Hold one generation slot for the duration of the block."""
+        if not self.enabled:
+            yield
+            return
+        await self.acquire(priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            held = time.monotonic() - start
+            self._avg_hold = held if not self._avg_hold else 0.8 * self._avg_hold + 0.2 * held
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": self._inflight,
+            "max_in_flight": self.max_inflight,
+            "queue_depth": {p: self._queued[lvl] for p, lvl in PRIORITIES.items()},
+            "max_queue": self.max_queue,
+            "avg_slot_seconds": round(self._avg_hold, 3),
+            "estimated_wait_seconds": round(self.estimated_wait(), 3),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+admission = AdmissionController()
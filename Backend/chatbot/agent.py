@@ -1,9 +1,24 @@
+def _last_user_turn(prompt: str) -> str:
+    """Prompts with conversation history (chatbot.memory) end in "User: <question>\nAssistant:"."""
+    if prompt.endswith("\nAssistant:") and "User: " in prompt:
+        return prompt[:-len("\nAssistant:")].rsplit("User: ", 1)[1]
+    return prompt
+
 def generate_text(prompt: str) -> str:
-    return f"[Dummy Offline Bot] Backend is running. You said: {prompt}"
+    return f"[Dummy Offline Bot] Backend is running. You said: {_last_user_turn(prompt)}"
 
 def get_bot_reply(query: str) -> str:
     return generate_text(query)
 
+def stream_text(prompt: str):
+    """Yield the dummy reply word by word, the way a streaming model would."""
+    for i, word in enumerate(generate_text(prompt).split(" ")):
+        yield word if i == 0 else " " + word
+
+def generate_batch(queries: list[str]) -> list[str]:
+    """Batch entry point used by the inference scheduler."""
+    return [get_bot_reply(q) for q in queries]
+
 '''# backend_fastapi/chatbot/agent.py
 
 # backend_fastapi/chatbot/agent.py
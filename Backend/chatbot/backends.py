@@ -0,0 +1,367 @@
+# backend/chatbot/backends.py
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List
+
+# ===============================================================
+# ⚙️ Generation backends for the offline agent
+# Same tokenizer and generate() API, different runtimes:
+#   torch  - plain fp32 transformers model
+#   int8   - torch with dynamic int8 quantization of Linear layers
+#   onnx   - ONNX Runtime via optimum (exported once, cached on
+#            disk; ONNX_QUANTIZE=true serves a dynamic-int8 copy)
+# Selected with INFERENCE_BACKEND. All heavy imports happen in
+# load(), so importing this module stays cheap.
+# The torch backends also keep the key/value cache of registered
+# prompt prefixes (the fixed instruction header, and optionally
+# header + retrieved context), so a single-prompt generate or
+# stream only prefills the tokens after the prefix.
+# ===============================================================
+
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")  # torch | int8 | onnx
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))  # 0 = runtime default
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", "data/onnx")
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "false").lower() == "true"
+
+PREFIX_CACHE_ENABLED = os.getenv("PREFIX_CACHE_ENABLED", "true").lower() == "true"
+PREFIX_CACHE_MB = float(os.getenv("PREFIX_CACHE_MB", "256"))
+# Also cache header + retrieved context, once the same context has been seen twice
+PREFIX_CACHE_CONTEXTS = os.getenv("PREFIX_CACHE_CONTEXTS", "true").lower() == "true"
+
+OFFLINE_MODEL = "facebook/blenderbot-400M-distill"  # lightweight conversational model
+GENERATION_DEFAULTS = dict(max_new_tokens=150, temperature=0.7, do_sample=True)
+
+
+# Static prompt header -> marker ending the variable context that follows it (or None)
+PROMPT_PREFIXES: Dict[str, str | None] = {}
+
+
+def register_prompt_prefix(header: str, context_end: str | None = None):
+    """
+    Declare a fixed header that prompts start with. If `context_end` is
+    given, the text between the header and that marker (retrieved context)
+    is a second, LRU-cached prefix level.
+    """
+    PROMPT_PREFIXES[header] = context_end
+
+
+def _common_length(a, b) -> int:
+    n = min(len(a), len(b))
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+
+def _cache_bytes(kv) -> int:
+    return sum(t.numel() * t.element_size() for layer in kv for t in layer if t is not None)
+
+
+class PrefixEntry:
+    __slots__ = ("ids", "kv", "nbytes")
+
+    def __init__(self, ids, kv):
+        self.ids = ids  # token ids of the prefix, as the tokenizer encodes it on its own
+        self.kv = kv    # DynamicCache after prefilling `ids`; copied before every use
+        self.nbytes = _cache_bytes(kv)
+
+
+class PrefixCache:
+    """Prompt prefix -> PrefixEntry, LRU-evicted past `max_bytes`. Pinned (header) entries stay."""
+
+    def __init__(self, max_bytes: int, seen_window: int = 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, PrefixEntry]" = OrderedDict()
+        self._pinned = set()
+        self._seen: "OrderedDict[str, None]" = OrderedDict()  # contexts seen once, not cached yet
+        self._seen_window = seen_window
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tokens_reused = 0
+
+    def get(self, prefix: str) -> PrefixEntry | None:
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is not None:
+                self._entries.move_to_end(prefix)
+            return entry
+
+    def seen_before(self, prefix: str) -> bool:
+        """True from the second sighting on, so one-off contexts don't evict useful ones."""
+        with self._lock:
+            if prefix in self._seen:
+                del self._seen[prefix]
+                return True
+            self._seen[prefix] = None
+            if len(self._seen) > self._seen_window:
+                self._seen.popitem(last=False)
+            return False
+
+    def put(self, prefix: str, entry: PrefixEntry, pinned: bool = False):
+        with self._lock:
+            old = self._entries.pop(prefix, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+            self._entries[prefix] = entry
+            self.bytes += entry.nbytes
+            if pinned:
+                self._pinned.add(prefix)
+            for key in list(self._entries):
+                if self.bytes <= self.max_bytes:
+                    break
+                if key in self._pinned or key == prefix:
+                    continue
+                self.bytes -= self._entries.pop(key).nbytes
+                self.evictions += 1
+
+    def record(self, reused_tokens: int):
+        with self._lock:
+            if reused_tokens:
+                self.hits += 1
+                self.tokens_reused += reused_tokens
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "pinned": len(self._pinned),
+                "mb": round(self.bytes / 2 ** 20, 1),
+                "max_mb": round(self.max_bytes / 2 ** 20, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "tokens_reused": self.tokens_reused,
+            }
+
+
+def _stop_when(event: threading.Event):
+    """Stopping criteria for generate() that end every sequence once `event` is set."""
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class Cancelled(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+    return StoppingCriteriaList([Cancelled()])
+
+
+class GenerationBackend:
+    name = "base"
+    supports_prefix_cache = False
+
+    def __init__(self, model_name: str = OFFLINE_MODEL):
+        self.model_name = model_name
+        self.tokenizer = None
+        self.model = None
+        self.prefix_cache = None
+
+    def load(self) -> "GenerationBackend":
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        # Batched causal generation needs left padding and a pad token
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = self._load_model()
+        if PREFIX_CACHE_ENABLED and self.supports_prefix_cache:
+            self.prefix_cache = PrefixCache(int(PREFIX_CACHE_MB * 2 ** 20))
+        return self
+
+    def _load_model(self):
+        raise NotImplementedError
+
+    def _prefix_kv(self, prompt: str, ids):
+        """
+        Copy of the key/value cache for the longest cached prefix of this
+        prompt's token ids, or None. generate() then only prefills the rest.
+        """
+        header = next((h for h in PROMPT_PREFIXES if prompt.startswith(h)), None)
+        if header is None or self.prefix_cache is None:
+            return None
+        entry = self._prefix_entry(header, pinned=True)
+        context_end = PROMPT_PREFIXES[header]
+        if PREFIX_CACHE_CONTEXTS and context_end:
+            cut = prompt.find(context_end, len(header))
+            if cut > len(header):
+                context = prompt[:cut]
+                cached = self.prefix_cache.get(context)
+                if cached is not None:
+                    entry = cached
+                elif self.prefix_cache.seen_before(context):
+                    entry = self._prefix_entry(context, base=entry)
+
+        # Tokens can merge across the boundary (or the prefix ends in EOS):
+        # only the ids the full prompt actually starts with are reused.
+        reused = _common_length(entry.ids.tolist(), ids.tolist())
+        if reused >= len(ids):
+            reused = len(ids) - 1  # generate() needs at least one token to feed
+        self.prefix_cache.record(max(reused, 0))
+        if reused <= 0:
+            return None
+        kv = copy.deepcopy(entry.kv)
+        if reused < len(entry.ids):
+            kv.crop(reused)
+        return kv
+
+    def _prefix_entry(self, prefix: str, base: PrefixEntry | None = None, pinned: bool = False) -> PrefixEntry:
+        entry = self.prefix_cache.get(prefix)
+        if entry is None:
+            ids = self.tokenizer(prefix, return_tensors="pt")["input_ids"][0]
+            entry = PrefixEntry(ids, self._prefill(ids, base))
+            self.prefix_cache.put(prefix, entry, pinned=pinned)
+        return entry
+
+    def _prefill(self, ids, base: PrefixEntry | None = None):
+        """Key/value cache for `ids`, continuing from `base` where they agree."""
+        import torch
+        from transformers import DynamicCache
+
+        reused = _common_length(base.ids.tolist(), ids.tolist()) if base is not None else 0
+        if reused:
+            kv = copy.deepcopy(base.kv)
+            kv.crop(reused)
+        else:
+            kv = DynamicCache()
+        if reused < len(ids):
+            with torch.no_grad():
+                rest = ids[reused:].unsqueeze(0).to(self.model.device)
+                kv = self.model(input_ids=rest, past_key_values=kv, use_cache=True).past_key_values
+        return kv
+
+    def _single_inputs(self, prompt: str) -> dict:
+        """Tokenized prompt on the model's device, plus past_key_values when a cached prefix applies."""
+        inputs = self.tokenizer(prompt, return_tensors="pt")
+        kv = self._prefix_kv(prompt, inputs["input_ids"][0]) if self.prefix_cache is not None else None
+        inputs = inputs.to(self.model.device)
+        if kv is not None:
+            inputs["past_key_values"] = kv  # built by the model, so already on its device
+        return inputs
+
+    def generate_batch(self, prompts: List[str], **generation) -> List[str]:
+        """One generate() call for the whole micro-batch; returns only the new text per prompt."""
+        if len(prompts) == 1 and self.prefix_cache is not None:
+            # Left padding would shift a shared prefix, so only single prompts reuse it
+            inputs = self._single_inputs(prompts[0])
+        else:
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.model.device)
+        output = self.model.generate(
+            **inputs, pad_token_id=self.tokenizer.pad_token_id, **{**GENERATION_DEFAULTS, **generation}
+        )
+        new_tokens = output[:, inputs["input_ids"].shape[1]:]
+        return [text.strip() for text in self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)]
+
+    def stream(self, prompt: str, **generation) -> Iterator[str]:
+        """
+        Tokens as generate() produces them on a helper thread. Closing the
+        iterator early (the reader went away) stops generate() at its next step.
+        """
+        from transformers import TextIteratorStreamer
+
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        inputs = self._single_inputs(prompt)
+        stop = threading.Event()
+        worker = threading.Thread(
+            target=self.model.generate,
+            kwargs=dict(**inputs, streamer=streamer, pad_token_id=self.tokenizer.pad_token_id,
+                        stopping_criteria=_stop_when(stop), **{**GENERATION_DEFAULTS, **generation}),
+            daemon=True
+        )
+        worker.start()
+        try:
+            yield from streamer
+        finally:
+            stop.set()
+            worker.join()
+
+
+class TorchBackend(GenerationBackend):
+    name = "torch"
+    supports_prefix_cache = True
+
+    def _load_model(self):
+        import torch
+        from transformers import AutoModelForCausalLM
+
+        if INFERENCE_THREADS > 0:
+            torch.set_num_threads(INFERENCE_THREADS)
+        model = AutoModelForCausalLM.from_pretrained(self.model_name)
+        if torch.cuda.is_available() and self.name == "torch":
+            model = model.to("cuda")
+        return model.eval()
+
+    def generate_batch(self, prompts: List[str], **generation) -> List[str]:
+        import torch
+
+        with torch.inference_mode():
+            return super().generate_batch(prompts, **generation)
+
+
+class Int8Backend(TorchBackend):
+    """Dynamic int8: Linear weights stored as int8, activations quantized on the fly (CPU only)."""
+    name = "int8"
+
+    def _load_model(self):
+        import torch
+
+        model = super()._load_model()
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxBackend(GenerationBackend):
+    name = "onnx"
+
+    def _export_dir(self) -> str:
+        return os.path.join(ONNX_CACHE_DIR, self.model_name.replace("/", "--"))
+
+    def _load_model(self):
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForCausalLM
+
+        options = onnxruntime.SessionOptions()
+        if INFERENCE_THREADS > 0:
+            options.intra_op_num_threads = INFERENCE_THREADS
+
+        export_dir = self._export_dir()
+        if not os.path.exists(os.path.join(export_dir, "model.onnx")):
+            # First run exports the model; later runs (and other workers) reuse the files
+            print(f"📦 Exporting {self.model_name} to ONNX in {export_dir} ...")
+            ORTModelForCausalLM.from_pretrained(self.model_name, export=True).save_pretrained(export_dir)
+            self.tokenizer.save_pretrained(export_dir)
+
+        if not ONNX_QUANTIZE:
+            return ORTModelForCausalLM.from_pretrained(export_dir, session_options=options)
+
+        quantized_dir = export_dir + "-int8"
+        if not os.path.exists(os.path.join(quantized_dir, "model_quantized.onnx")):
+            from optimum.onnxruntime import ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+            print(f"📦 Quantizing ONNX model to int8 in {quantized_dir} ...")
+            quantizer = ORTQuantizer.from_pretrained(export_dir, file_name="model.onnx")
+            quantizer.quantize(save_dir=quantized_dir, quantization_config=AutoQuantizationConfig.avx2(is_static=False))
+        return ORTModelForCausalLM.from_pretrained(
+            quantized_dir, file_name="model_quantized.onnx", session_options=options
+        )
+
+
+BACKENDS = {
+    "torch": TorchBackend,
+    "int8": Int8Backend,
+    "onnx": OnnxBackend,
+}
+
+
+def make_backend(name: str = INFERENCE_BACKEND, model_name: str = OFFLINE_MODEL) -> GenerationBackend:
+    """Instantiate and load the named backend."""
+    if name not in BACKENDS:
+        raise ValueError(f"unknown INFERENCE_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](model_name).load()
@@ -0,0 +1,68 @@
+# backend/chatbot/bm25.py
+import math
+import re
+from collections import Counter, defaultdict
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# ===============================================================
+# 🔤 BM25 keyword index
+# Lightweight lexical index over the same chunks as the vector
+# index, for hybrid retrieval: exact crop / pest / chemical names
+# that dense embeddings blur together. Per-posting BM25 weights are
+# query independent, so they're computed once at build time and a
+# query is a handful of numpy scatter-adds.
+# ===============================================================
+
+# \w alone splits Devanagari words at vowel signs (not alphanumeric)
+_TOKEN = re.compile(r"[\w\u0900-\u097F]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    def __init__(self, texts: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.size = len(texts)
+        postings = defaultdict(list)
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for position, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[position] = sum(counts.values())
+            for term, tf in counts.items():
+                postings[term].append((position, tf))
+
+        avg_length = float(lengths.mean()) if self.size else 0.0
+        norm = k1 * (1 - b + b * lengths / avg_length) if avg_length else np.full(self.size, k1)
+        self._postings = {}
+        for term, entries in postings.items():
+            positions = np.fromiter((p for p, _ in entries), dtype=np.int64, count=len(entries))
+            tf = np.fromiter((t for _, t in entries), dtype=np.float32, count=len(entries))
+            idf = math.log(1 + (self.size - len(entries) + 0.5) / (len(entries) + 0.5))
+            self._postings[term] = (positions, idf * tf * (k1 + 1) / (tf + norm[positions]))
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k (position, score) pairs; positions index the texts the index was built from."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [(int(position), float(scores[position])) for position in hits]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence], k: int, c: int = 60) -> list:
+    """Merge ranked lists of hashable items by sum of 1 / (c + rank)."""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            fused[item] += 1.0 / (c + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)[:k]
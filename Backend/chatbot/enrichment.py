@@ -0,0 +1,148 @@
+# backend/chatbot/enrichment.py
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from chatbot.text_match import compile_phrases, normalize_phrase
+
+# ===============================================================
+# 🌾 Reply enrichment rules
+# Agronomy tips appended to replies, loaded from a JSON file:
+#   concepts: name -> synonyms (English, Hinglish, Hindi)
+#   rules:    {"id", "all": [concepts that must all appear], "tip"}
+# Every synonym of every concept is compiled into one matcher, so
+# a query is scanned once. Rules are indexed by concept and fired
+# by counting, so only rules sharing a concept with the query are
+# ever looked at. The file is re-read when its mtime changes.
+# ===============================================================
+
+ENRICHMENT_RULES_PATH = os.getenv(
+    "ENRICHMENT_RULES_PATH", os.path.join(os.path.dirname(__file__), "data", "enrichment_rules.json")
+)
+ENRICHMENT_RELOAD_SECONDS = float(os.getenv("ENRICHMENT_RELOAD_SECONDS", "5"))
+ENRICHMENT_MAX_TIPS = int(os.getenv("ENRICHMENT_MAX_TIPS", "3"))
+
+
+class RuleSet:
+    """Compiled, immutable view of one rules file."""
+
+    def __init__(self, concepts: Dict[str, List[str]], rules: List[dict]):
+        phrase_concepts = defaultdict(set)
+        for concept, synonyms in concepts.items():
+            for phrase in [concept, *synonyms]:
+                phrase_concepts[normalize_phrase(phrase)].add(concept)
+
+        self.tips: List[str] = []
+        self.ids: List[str] = []
+        self.needed: List[int] = []
+        self.by_concept = defaultdict(list)  # concept -> rule positions
+        for rule in rules:
+            required = {c.strip() for c in rule.get("all", []) if c.strip()}
+            if not required or not rule.get("tip"):
+                raise ValueError(f"rule {rule.get('id')!r} needs a non-empty 'all' and a 'tip'")
+            position = len(self.tips)
+            for concept in required:
+                # A term that isn't a declared concept stands for itself
+                phrase_concepts[normalize_phrase(concept)].add(concept)
+                self.by_concept[concept].append(position)
+            self.tips.append(rule["tip"])
+            self.ids.append(rule.get("id") or f"rule-{position}")
+            self.needed.append(len(required))
+
+        self.phrase_concepts = dict(phrase_concepts)
+        self.matcher = compile_phrases(self.phrase_concepts)
+
+    @classmethod
+    def from_file(cls, path: str) -> "RuleSet":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("concepts", {}), data.get("rules", []))
+
+    def concepts_in(self, text: str) -> set:
+        if self.matcher is None:
+            return set()
+        found = set()
+        for match in self.matcher.finditer(text):
+            found.update(self.phrase_concepts.get(normalize_phrase(match.group()), ()))
+        return found
+
+    def match(self, text: str) -> List[int]:
+        """Positions of the rules whose concepts all appear in text, in file order."""
+        hits = defaultdict(int)
+        for concept in self.concepts_in(text):
+            for position in self.by_concept.get(concept, ()):
+                hits[position] += 1
+        return sorted(p for p, count in hits.items() if count == self.needed[p])
+
+
+class EnrichmentEngine:
+    def __init__(self, path: str = ENRICHMENT_RULES_PATH, reload_seconds: float = ENRICHMENT_RELOAD_SECONDS):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self.rules = RuleSet({}, [])
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.errors = 0
+        self.fired = 0
+        self.load()
+
+    def load(self):
+        """(Re)compile the rules file; a broken file keeps the previous rules."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        try:
+            rules = RuleSet.from_file(self.path)
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            self._mtime = mtime  # warn once per edit, not on every check
+            self.errors += 1
+            print(f"⚠️ Enrichment rules not reloaded from {self.path}: {e}")
+            return
+        self.rules = rules  # swapped whole, readers never see a half-built set
+        self._mtime = mtime
+        self.reloads += 1
+        print(f"🌾 Loaded {len(rules.tips)} enrichment rules from {self.path}")
+
+    def maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked < self.reload_seconds:
+            return
+        with self._lock:
+            if now - self._checked < self.reload_seconds:
+                return
+            self._checked = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return
+            if mtime != self._mtime:
+                self.load()
+
+    def tips(self, query: str, limit: int = ENRICHMENT_MAX_TIPS) -> List[str]:
+        self.maybe_reload()
+        rules = self.rules
+        positions = rules.match(query)[:limit]
+        self.fired += len(positions)
+        return [rules.tips[p] for p in positions]
+
+    def enrich(self, query: str, reply: str) -> str:
+        tips = self.tips(query)
+        return "\n\n".join([reply, *tips]) if tips else reply
+
+    def stats(self) -> dict:
+        return {
+            "rules": len(self.rules.tips),
+            "phrases": len(self.rules.phrase_concepts),
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "tips_added": self.fired,
+        }
+
+
+enrichment = EnrichmentEngine()
@@ -1,7 +1,9 @@
 import os
-import torch
-from transformers import pipeline, AutoModelForCausalLM, AutoTokenizer
-from huggingface_hub import InferenceClient
+
+from chatbot.backends import INFERENCE_BACKEND, OFFLINE_MODEL, make_backend
+from chatbot.model_registry import registry
+from chatbot.scheduler import InferenceScheduler
+from metrics import MODEL_FALLBACKS
 
 # ===============================================================
 # 🤖 Hugging Face Conversational Agent for Agro Chatbot
@@ -21,22 +23,37 @@ def use_online_model():
     Best for when internet is available.
     """
     try:
+        from huggingface_hub import InferenceClient
+
         model_id = "tiiuae/falcon-7b-instruct"  # You can switch to LLaMA, Falcon, etc.
         client = InferenceClient(model=model_id, token=HF_TOKEN)
 
-        async def online_reply(prompt: str) -> str:
-            response = client.text_generation(
+        def online_batch(prompts: list[str]) -> list[str]:
+            replies = []
+            for prompt in prompts:
+                response = client.text_generation(
+                    prompt,
+                    max_new_tokens=200,
+                    temperature=0.6,
+                    repetition_penalty=1.2
+                )
+                replies.append(response.strip())
+            return replies
+
+        def online_stream(prompt: str):
+            yield from client.text_generation(
                 prompt,
                 max_new_tokens=200,
                 temperature=0.6,
-                repetition_penalty=1.2
+                repetition_penalty=1.2,
+                stream=True
             )
-            return response.strip()
 
-        return online_reply
+        return online_batch, online_stream
 
     except Exception as e:
         print("⚠️ Online HF model failed, switching to offline:", e)
+        MODEL_FALLBACKS.inc(reason="online_unavailable")
         return use_offline_model()
 
 # ------------------------------
@@ -45,40 +62,58 @@ def use_online_model():
 def use_offline_model():
     """
     Uses a locally downloaded model for offline responses.
-    Great for rural/no-internet deployments.
+    Great for rural/no-internet deployments. The runtime (fp32 torch,
+    int8, ONNX Runtime) is picked by INFERENCE_BACKEND, see backends.py.
     """
-    model_name = "facebook/blenderbot-400M-distill"  # lightweight conversational model
-
-    print(f"🔁 Loading offline model: {model_name} ...")
+    print(f"🔁 Loading offline model: {OFFLINE_MODEL} ({INFERENCE_BACKEND} backend) ...")
     try:
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModelForCausalLM.from_pretrained(model_name)
-        pipe = pipeline(
-            "text-generation",
-            model=model,
-            tokenizer=tokenizer,
-            device=0 if torch.cuda.is_available() else -1
-        )
-
-        async def offline_reply(prompt: str) -> str:
-            result = pipe(prompt, max_new_tokens=150, temperature=0.7, do_sample=True)
-            return result[0]["generated_text"].strip()
-
+        backend = make_backend(INFERENCE_BACKEND, OFFLINE_MODEL)
         print("✅ Offline model loaded successfully")
-        return offline_reply
+        # One generate() per micro-batch instead of one per prompt
+        return backend.generate_batch, backend.stream
 
     except Exception as e:
         print("❌ Failed to load offline model:", e)
 
-        async def fallback(prompt: str) -> str:
-            return "Sorry, I’m having trouble processing that query right now."
+        def fallback(prompts: list[str]) -> list[str]:
+            MODEL_FALLBACKS.inc(len(prompts), reason="offline_load_failed")
+            return ["Sorry, I’m having trouble processing that query right now."] * len(prompts)
+
+        def fallback_stream(prompt: str):
+            MODEL_FALLBACKS.inc(reason="offline_load_failed")
+            yield "Sorry, I’m having trouble processing that query right now."
 
-        return fallback
+        return fallback, fallback_stream
 
 # ------------------------------
 # 🔄 Model Selection Logic
 # ------------------------------
-if USE_OFFLINE or not HF_TOKEN:
-    get_hf_response = use_offline_model()
-else:
-    get_hf_response = use_online_model()
+def load_chat_model():
+    if USE_OFFLINE or not HF_TOKEN:
+        return use_offline_model()
+    return use_online_model()
+
+# Loaded on first use or by registry.warm_up(), not at import
+registry.register("chat_model", load_chat_model)
+
+def generate_batch(prompts: list[str]) -> list[str]:
+    batch_fn, _ = registry.get("chat_model")
+    return batch_fn(prompts)
+
+def generate_stream(prompt: str):
+    _, stream_fn = registry.get("chat_model")
+    return stream_fn(prompt)
+
+# All generation goes through the scheduler's dedicated thread pool
+scheduler = InferenceScheduler(generate_batch, generate_stream)
+
+async def get_hf_response(prompt: str) -> str:
+    return await scheduler.submit(prompt)
+
+async def get_hf_responses(prompts: list[str]) -> list[str]:
+    """Many prompts at once; the scheduler packs them into micro-batches."""
+    return await scheduler.submit_many(prompts)
+
+def stream_hf_response(prompt: str):
+    """Async iterator over reply tokens for streaming endpoints."""
+    return scheduler.stream(prompt)
@@ -0,0 +1,359 @@
+# backend/chatbot/index_manager.py
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+# ===============================================================
+# 🗂️ Vector index manager
+# FAISS index over the agronomy corpus that can grow without a
+# rebuild. Documents get int64 ids (IndexIDMap2, or IVF's own id
+# lists) plus a string key, e.g. a chunk hash, used for deletes.
+#
+# On disk every commit is a new immutable snapshot directory and
+# CURRENT names the live one, so readers load it memory-mapped
+# (several workers share the pages) and swap the in-memory
+# snapshot reference atomically: a reload never blocks a query.
+#
+#   data/vector_index/
+#     CURRENT                -> "snap-000007"
+#     snap-000007/index.faiss, docs.jsonl, manifest.json
+# ===============================================================
+
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "data/vector_index")
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")  # flat | ivf | hnsw
+VECTOR_INDEX_NLIST = int(os.getenv("VECTOR_INDEX_NLIST", "1024"))
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "16"))
+VECTOR_INDEX_HNSW_M = int(os.getenv("VECTOR_INDEX_HNSW_M", "32"))
+VECTOR_INDEX_EF_CONSTRUCTION = int(os.getenv("VECTOR_INDEX_EF_CONSTRUCTION", "200"))
+VECTOR_INDEX_EF_SEARCH = int(os.getenv("VECTOR_INDEX_EF_SEARCH", "64"))
+VECTOR_INDEX_MMAP = os.getenv("VECTOR_INDEX_MMAP", "true").lower() == "true"
+VECTOR_INDEX_REFRESH_SECONDS = float(os.getenv("VECTOR_INDEX_REFRESH_SECONDS", "30"))
+VECTOR_INDEX_KEEP_SNAPSHOTS = int(os.getenv("VECTOR_INDEX_KEEP_SNAPSHOTS", "3"))
+
+INDEX_FILE = "index.faiss"
+DOCS_FILE = "docs.jsonl"
+MANIFEST_FILE = "manifest.json"
+
+
+def normalize(vectors) -> np.ndarray:
+    """float32 rows scaled to unit length, so inner product == cosine similarity."""
+    vectors = np.ascontiguousarray(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class IndexSnapshot:
+    """One immutable published version: the FAISS index plus its documents."""
+
+    def __init__(self, index, docs: Dict[int, dict], manifest: dict, name: str | None = None):
+        self.index = index
+        self.docs = docs
+        self.manifest = manifest
+        self.name = name
+
+    @property
+    def size(self) -> int:
+        return len(self.docs)
+
+
+class IndexManager:
+    def __init__(
+        self,
+        path: str = VECTOR_INDEX_PATH,
+        index_type: str = VECTOR_INDEX_TYPE,
+        nlist: int = VECTOR_INDEX_NLIST,
+        nprobe: int = VECTOR_INDEX_NPROBE,
+        hnsw_m: int = VECTOR_INDEX_HNSW_M,
+        ef_search: int = VECTOR_INDEX_EF_SEARCH,
+        mmap: bool = VECTOR_INDEX_MMAP,
+        refresh_seconds: float = VECTOR_INDEX_REFRESH_SECONDS,
+    ):
+        if index_type not in ("flat", "ivf", "hnsw"):
+            raise ValueError(f"unknown index type: {index_type}")
+        self.path = path
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.mmap = mmap
+        self.refresh_seconds = refresh_seconds
+
+        self._snapshot: IndexSnapshot | None = None
+        self._write_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._checked_at = 0.0
+        self.searches = 0
+        self.reloads = 0
+
+    # ------------------------------
+    # 📥 Loading and snapshot swap
+    # ------------------------------
+    def _current_name(self) -> str | None:
+        try:
+            with open(os.path.join(self.path, "CURRENT")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _read_snapshot(self, name: str, writable: bool = False) -> IndexSnapshot:
+        import faiss
+
+        directory = os.path.join(self.path, name)
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        index_path = os.path.join(directory, INDEX_FILE)
+        index = None
+        if self.mmap and not writable:
+            try:
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                index = None  # this index type / faiss build can't mmap; read it normally
+        if index is None:
+            index = faiss.read_index(index_path)
+        self._apply_search_params(index, manifest["index_type"])
+
+        docs = {}
+        with open(os.path.join(directory, DOCS_FILE), encoding="utf-8") as f:
+            for line in f:
+                doc = json.loads(line)
+                docs[doc.pop("id")] = doc
+        return IndexSnapshot(index, docs, manifest, name)
+
+    def _apply_search_params(self, index, index_type: str):
+        import faiss
+
+        inner = faiss.downcast_index(index.index) if hasattr(index, "index") else index
+        if index_type == "ivf":
+            faiss.extract_index_ivf(inner).nprobe = self.nprobe
+        elif index_type == "hnsw":
+            inner.hnsw.efSearch = self.ef_search
+
+    def load(self) -> IndexSnapshot | None:
+        """Load the snapshot CURRENT points to and swap it in; None if nothing was published yet."""
+        name = self._current_name()
+        self._checked_at = time.monotonic()
+        if name is None:
+            return None
+        if self._snapshot is None or self._snapshot.name != name:
+            snapshot = self._read_snapshot(name)
+            self._snapshot = snapshot  # single reference assignment; in-flight searches keep the old one
+            self.reloads += 1
+            print(f"🗂️ Vector index {name} loaded ({snapshot.size} docs, {snapshot.manifest['index_type']})")
+        return self._snapshot
+
+    def maybe_refresh(self):
+        """Pick up snapshots committed by other processes, loading in the background."""
+        if time.monotonic() - self._checked_at < self.refresh_seconds:
+            return
+        self._checked_at = time.monotonic()
+        name = self._current_name()
+        if name is None or (self._snapshot is not None and self._snapshot.name == name):
+            return
+        if self._refresh_lock.acquire(blocking=False):
+            def reload():
+                try:
+                    self.load()
+                except Exception as e:
+                    print("⚠️ Vector index reload failed, keeping current snapshot:", e)
+                finally:
+                    self._refresh_lock.release()
+            threading.Thread(target=reload, daemon=True).start()
+
+    @property
+    def snapshot(self) -> IndexSnapshot | None:
+        return self._snapshot
+
+    # ------------------------------
+    # 🔎 Search
+    # ------------------------------
+    def search(self, vectors, k: int = 3) -> List[List[Tuple[dict, float]]]:
+        """Batched top-k: one list of (doc, cosine score) per query vector."""
+        self.maybe_refresh()
+        snapshot = self._snapshot
+        queries = normalize(vectors)
+        if snapshot is None or snapshot.size == 0:
+            return [[] for _ in range(len(queries))]
+
+        # HNSW can't remove vectors; deleted ids stay in the graph and are filtered here
+        tombstones = snapshot.index.ntotal - snapshot.size
+        fetch = min(snapshot.index.ntotal, k + max(0, tombstones))
+        scores, ids = snapshot.index.search(queries, fetch)
+        self.searches += len(queries)
+
+        results = []
+        for row_scores, row_ids in zip(scores, ids):
+            hits = []
+            for score, doc_id in zip(row_scores, row_ids):
+                doc = snapshot.docs.get(int(doc_id))
+                if doc is not None:
+                    hits.append((doc, float(score)))
+                    if len(hits) == k:
+                        break
+            results.append(hits)
+        return results
+
+    # ------------------------------
+    # ✏️ Incremental updates
+    # ------------------------------
+    def _new_index(self, dim: int, train_vectors: np.ndarray):
+        import faiss
+
+        if self.index_type == "ivf":
+            # IVF wants ~39 training points per list; shrink nlist for small corpora.
+            # IVF stores our ids itself: an IDMap wrapper would mis-map ids after remove_ids.
+            nlist = max(1, min(self.nlist, len(train_vectors) // 39))
+            index = faiss.index_factory(dim, f"IVF{nlist},Flat", faiss.METRIC_INNER_PRODUCT)
+            index.train(train_vectors)
+        elif self.index_type == "hnsw":
+            index = faiss.index_factory(dim, f"IDMap2,HNSW{self.hnsw_m},Flat", faiss.METRIC_INNER_PRODUCT)
+            faiss.downcast_index(index.index).hnsw.efConstruction = VECTOR_INDEX_EF_CONSTRUCTION
+        else:
+            index = faiss.index_factory(dim, "IDMap2,Flat", faiss.METRIC_INNER_PRODUCT)
+        self._apply_search_params(index, self.index_type)
+        return index
+
+    def _writable(self) -> Tuple[object | None, Dict[int, dict], dict]:
+        """Private, writable copy of the live snapshot (the published one may be mmapped read-only)."""
+        name = self._current_name()
+        if name is None:
+            return None, {}, {"next_id": 0, "index_type": self.index_type}
+        snapshot = self._read_snapshot(name, writable=True)
+        return snapshot.index, dict(snapshot.docs), dict(snapshot.manifest)
+
+    def add_documents(
+        self,
+        texts: Sequence[str],
+        vectors,
+        metadatas: Sequence[dict] | None = None,
+        keys: Sequence[str] | None = None,
+    ) -> List[str]:
+        """Add documents and publish a new snapshot. Re-adding an existing key replaces it."""
+        vectors = normalize(vectors)
+        if len(vectors) != len(texts):
+            raise ValueError("texts and vectors must have the same length")
+        metadatas = metadatas or [{} for _ in texts]
+
+        with self._write_lock:
+            index, docs, manifest = self._writable()
+            if index is None:
+                index = self._new_index(vectors.shape[1], vectors)
+                manifest.update(dim=int(vectors.shape[1]), index_type=self.index_type)
+            elif vectors.shape[1] != manifest["dim"]:
+                raise ValueError(f"vector dimension {vectors.shape[1]} != index dimension {manifest['dim']}")
+
+            next_id = manifest["next_id"]
+            keys = list(keys) if keys is not None else [str(next_id + i) for i in range(len(texts))]
+            new_keys = set(keys)
+            replaced = {doc_id for doc_id, doc in docs.items() if doc["key"] in new_keys}
+            self._remove(index, docs, replaced)
+
+            ids = np.arange(next_id, next_id + len(texts), dtype=np.int64)
+            index.add_with_ids(vectors, ids)
+            for doc_id, text, metadata, key in zip(ids.tolist(), texts, metadatas, keys):
+                docs[doc_id] = {"key": key, "text": text, "metadata": metadata}
+            manifest["next_id"] = next_id + len(texts)
+            self._commit(index, docs, manifest)
+        return keys
+
+    def delete(self, keys: Iterable[str]) -> int:
+        """Remove documents by key and publish a new snapshot; returns how many were removed."""
+        keys = set(keys)
+        with self._write_lock:
+            index, docs, manifest = self._writable()
+            if index is None:
+                return 0
+            doomed = {doc_id for doc_id, doc in docs.items() if doc["key"] in keys}
+            if not doomed:
+                return 0
+            self._remove(index, docs, doomed)
+            self._commit(index, docs, manifest)
+        return len(doomed)
+
+    def _remove(self, index, docs: Dict[int, dict], doc_ids: set):
+        import faiss
+
+        if not doc_ids:
+            return
+        for doc_id in doc_ids:
+            docs.pop(doc_id, None)
+        try:
+            index.remove_ids(faiss.IDSelectorBatch(np.fromiter(doc_ids, dtype=np.int64)))
+        except RuntimeError:
+            pass  # HNSW: left as a tombstone, filtered at search time
+
+    def rebuild(self, texts: Sequence[str], vectors, metadatas=None, keys=None) -> List[str]:
+        """Replace the whole index (e.g. after switching index type or to drop HNSW tombstones)."""
+        vectors = normalize(vectors)
+        metadatas = metadatas or [{} for _ in texts]
+        keys = list(keys) if keys is not None else [str(i) for i in range(len(texts))]
+        with self._write_lock:
+            index = self._new_index(vectors.shape[1], vectors)
+            ids = np.arange(len(texts), dtype=np.int64)
+            index.add_with_ids(vectors, ids)
+            docs = {
+                doc_id: {"key": key, "text": text, "metadata": metadata}
+                for doc_id, text, metadata, key in zip(ids.tolist(), texts, metadatas, keys)
+            }
+            manifest = {"dim": int(vectors.shape[1]), "index_type": self.index_type, "next_id": len(texts)}
+            self._commit(index, docs, manifest)
+        return keys
+
+    # ------------------------------
+    # 💾 Publishing
+    # ------------------------------
+    def _commit(self, index, docs: Dict[int, dict], manifest: dict):
+        """Write a new snapshot directory, flip CURRENT with an atomic rename, then swap it in."""
+        import faiss
+
+        os.makedirs(self.path, exist_ok=True)
+        current = self._current_name()
+        version = int(current.rsplit("-", 1)[1]) + 1 if current else 1
+        name = f"snap-{version:06d}"
+        directory = os.path.join(self.path, name)
+        tmp_directory = directory + ".tmp"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+
+        faiss.write_index(index, os.path.join(tmp_directory, INDEX_FILE))
+        with open(os.path.join(tmp_directory, DOCS_FILE), "w", encoding="utf-8") as f:
+            for doc_id, doc in docs.items():
+                f.write(json.dumps({"id": doc_id, **doc}, ensure_ascii=False) + "\n")
+        manifest = {**manifest, "size": len(docs), "created_at": time.time()}
+        with open(os.path.join(tmp_directory, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_directory, directory)
+
+        pointer = os.path.join(self.path, "CURRENT.tmp")
+        with open(pointer, "w") as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer, os.path.join(self.path, "CURRENT"))
+
+        self.load()
+        self._prune(keep=name)
+
+    def _prune(self, keep: str):
+        # Workers still mapping an older snapshot keep their pages after the unlink
+        snapshots = sorted(d for d in os.listdir(self.path) if d.startswith("snap-") and not d.endswith(".tmp"))
+        for name in snapshots[:-VECTOR_INDEX_KEEP_SNAPSHOTS]:
+            if name != keep:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "snapshot": snapshot.name if snapshot else None,
+            "index_type": snapshot.manifest["index_type"] if snapshot else self.index_type,
+            "documents": snapshot.size if snapshot else 0,
+            "vectors": snapshot.index.ntotal if snapshot else 0,
+            "searches": self.searches,
+            "reloads": self.reloads,
+        }
@@ -0,0 +1,221 @@
+# backend/chatbot/intent.py
+import json
+import math
+import os
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+from chatbot.bm25 import tokenize
+from chatbot.text_match import compile_phrases, normalize_phrase
+from chatbot.utils import CROP_BY_SEASON
+
+# ===============================================================
+# 🧭 Intent router
+# Nearest-example classifier over TF-IDF features (words, word
+# bigrams and in-word character trigrams, so Hinglish spellings
+# like "gehun"/"gehu" still overlap). Pure Python, built at
+# import from a small examples file; a query only touches the
+# examples it shares a feature with.
+# Confident greetings, help requests and season -> crop lookups
+# get a templated answer without touching the model, but only when
+# the query asks nothing else ("namaste, tomato me keeda lag gaya"
+# is a pest question); everything else just records its intent.
+# ===============================================================
+
+INTENT_EXAMPLES_PATH = os.getenv(
+    "INTENT_EXAMPLES_PATH", os.path.join(os.path.dirname(__file__), "data", "intent_examples.json")
+)
+INTENT_ROUTING = os.getenv("INTENT_ROUTING", "true").lower() == "true"
+INTENT_MIN_SCORE = float(os.getenv("INTENT_MIN_SCORE", "0.4"))
+INTENT_MIN_MARGIN = float(os.getenv("INTENT_MIN_MARGIN", "0.1"))
+# Greetings / help requests with words outside their examples are templated only up to this length
+INTENT_TEMPLATE_MAX_WORDS = int(os.getenv("INTENT_TEMPLATE_MAX_WORDS", "4"))
+
+DEFAULT_INTENT = "advice"  # what every message was labelled before the router
+
+Vector = Dict[str, float]
+
+
+def features(text: str) -> Counter:
+    tokens = tokenize(text)
+    found = Counter(f"w:{t}" for t in tokens)
+    found.update(f"b:{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    for t in tokens:
+        padded = f"#{t}#"
+        found.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return found
+
+
+def _normalize(vector: Vector) -> Vector:
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {f: v / norm for f, v in vector.items()} if norm else {}
+
+
+class IntentClassifier:
+    def __init__(self, examples: Dict[str, List[str]]):
+        docs = [(intent, features(text)) for intent, texts in examples.items() for text in texts]
+        df = Counter(f for _, feats in docs for f in feats)
+        n = len(docs)
+        self.idf = {f: math.log((1 + n) / (1 + count)) + 1 for f, count in df.items()}
+        self.intents = list(examples)
+        self._labels = [intent for intent, _ in docs]
+        # feature -> [(example index, weight)]: only examples sharing a feature are touched
+        self._postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for i, (_, feats) in enumerate(docs):
+            for f, weight in self._vector(feats).items():
+                self._postings[f].append((i, weight))
+
+    def _vector(self, feats: Counter) -> Vector:
+        return _normalize({f: (1 + math.log(c)) * self.idf[f] for f, c in feats.items() if f in self.idf})
+
+    def scores(self, text: str) -> List[Tuple[str, float]]:
+        """(intent, cosine similarity to its closest example), best first."""
+        dots: Dict[int, float] = defaultdict(float)
+        for f, weight in self._vector(features(text)).items():
+            for i, example_weight in self._postings.get(f, ()):
+                dots[i] += weight * example_weight
+        best: Dict[str, float] = {}
+        for i, dot in dots.items():
+            intent = self._labels[i]
+            if dot > best.get(intent, 0.0):
+                best[intent] = dot
+        return sorted(best.items(), key=lambda item: item[1], reverse=True)
+
+    def classify(self, text: str) -> Tuple[str, float, float]:
+        """Best intent, its score and its margin over the runner-up."""
+        ranked = self.scores(text)
+        if not ranked:
+            return DEFAULT_INTENT, 0.0, 0.0
+        best, score = ranked[0]
+        return best, score, score - (ranked[1][1] if len(ranked) > 1 else 0.0)
+
+
+class Route:
+    __slots__ = ("intent", "score", "reply")
+
+    def __init__(self, intent: str, score: float, reply: str | None = None):
+        self.intent = intent
+        self.score = score
+        self.reply = reply  # templated answer; None means the model answers
+
+
+# ------------------------------
+# 📝 Templates
+# ------------------------------
+SEASON_NAMES = {"rainy": "monsoon (kharif)", "winter": "winter (rabi)", "summer": "summer (zaid)"}
+
+
+def greeting_reply(query: str, slots: dict) -> str:
+    return ("🙏 Namaste! I'm AgroAI, your farming assistant. Ask me about crops for the season, "
+            "fertilizer doses, pests and diseases, weather or mandi prices.")
+
+
+def help_reply(query: str, slots: dict) -> str:
+    return ("🌾 I can help with:\n"
+            "• Which crops to grow in each season (e.g. \"crops for rabi\")\n"
+            "• Fertilizer and irrigation advice for your crop\n"
+            "• Identifying pests and diseases and how to treat them\n"
+            "• Weather, mandi prices and government schemes\n"
+            "Ask in English or Hindi.")
+
+
+def season_crops_reply(query: str, slots: dict) -> str | None:
+    season = slots.get("season")
+    if season not in CROP_BY_SEASON:
+        return None  # no season named: let the model handle it
+    crops = ", ".join(CROP_BY_SEASON[season])
+    return f"🌱 Crops suited to the {SEASON_NAMES.get(season, season)} season: {crops}. Choose varieties recommended for your district."
+
+
+TEMPLATES = {
+    "greeting": greeting_reply,
+    "help": help_reply,
+    "season_crops": season_crops_reply,
+}
+# Templates whose whole answer is canned: the query must be nothing but the greeting / help request
+SMALL_TALK = {"greeting", "help"}
+
+
+class IntentRouter:
+    def __init__(
+        self,
+        path: str = INTENT_EXAMPLES_PATH,
+        min_score: float = INTENT_MIN_SCORE,
+        min_margin: float = INTENT_MIN_MARGIN,
+        routing: bool = INTENT_ROUTING,
+    ):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.classifier = IntentClassifier(data["intents"])
+        self._vocab = {intent: {t for text in texts for t in tokenize(text)} for intent, texts in data["intents"].items()}
+        self._topics = compile_phrases(data.get("topics", []))
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.routing = routing
+        self._seasons = {
+            normalize_phrase(word): season
+            for season, words in data.get("slots", {}).get("season", {}).items() for word in words
+        }
+        self._season_matcher = compile_phrases(self._seasons)
+        self.counts: Counter = Counter()
+        self.templated = 0
+
+    def slots(self, query: str) -> dict:
+        found = {}
+        if self._season_matcher is not None:
+            match = self._season_matcher.search(query)
+            if match:
+                found["season"] = self._seasons[normalize_phrase(match.group())]
+        return found
+
+    def only_asks(self, intent: str, query: str) -> bool:
+        """True when the query carries no question beyond the templated intent."""
+        if self._topics is not None and self._topics.search(query):
+            return False  # a pest / fertilizer / price ... topic needs the model
+        if intent not in SMALL_TALK:
+            return True
+        tokens = tokenize(query)
+        vocab = self._vocab.get(intent, set())
+        return len(tokens) <= INTENT_TEMPLATE_MAX_WORDS or all(t in vocab for t in tokens)
+
+    def _classify(self, query: str) -> Tuple[str, float, bool]:
+        """Intent, its score, and whether its template may answer."""
+        ranked = self.classifier.scores(query)
+        if not ranked:
+            return DEFAULT_INTENT, 0.0, False
+        intent, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if score < self.min_score or score - runner_up < self.min_margin:
+            return DEFAULT_INTENT, score, False
+        if intent not in TEMPLATES or self.only_asks(intent, query):
+            return intent, score, True
+        # Mixed query ("help me, my cotton has whiteflies"): label it by the rest of the question
+        rest = query
+        if intent in SMALL_TALK:
+            rest = " ".join(t for t in tokenize(query) if t not in self._vocab.get(intent, ()))
+        for other, other_score in self.classifier.scores(rest):
+            if other not in TEMPLATES:
+                return (other, other_score, False) if other_score >= self.min_score else (DEFAULT_INTENT, score, False)
+        return DEFAULT_INTENT, score, False
+
+    def route(self, query: str) -> Route:
+        intent, score, answerable = self._classify(query)
+        self.counts[intent] += 1
+
+        template = TEMPLATES.get(intent) if self.routing and answerable else None
+        reply = template(query, self.slots(query)) if template else None
+        if reply is not None:
+            self.templated += 1
+        return Route(intent, score, reply)
+
+    def stats(self) -> dict:
+        total = sum(self.counts.values())
+        return {
+            "routing": self.routing,
+            "intents": dict(self.counts),
+            "templated": self.templated,
+            "templated_share": round(self.templated / total, 3) if total else 0.0,
+        }
+
+
+intent_router = IntentRouter()
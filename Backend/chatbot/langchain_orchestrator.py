@@ -1,18 +1,82 @@
 # backend/chatbot/langchain_orchestrator.py
-from chatbot.hf_agent import get_hf_response
-from chatbot.retriever import retrieve_context
-from chatbot.safety_filters import clean_input
+import asyncio
 
-async def run_chatbot_pipeline(user_query: str) -> str:
-    query = clean_input(user_query)
-    context = retrieve_context(query)
+from chatbot.backends import register_prompt_prefix
+from chatbot.hf_agent import get_hf_response, get_hf_responses, stream_hf_response
+from chatbot.response_cache import normalize_query, reply_cache
+from chatbot.retriever import retrieve_context_many
+from chatbot.safety_filters import clean_input
 
-    prompt = f"""You are an agricultural assistant helping Indian farmers.
+# Every prompt starts with this header; the backend keeps its key/value
+# cache (and those of recurring retrieved contexts, up to QUESTION_MARKER)
+PROMPT_HEADER = """You are an agricultural assistant helping Indian farmers.
 Use the following context if relevant:
-{context}
+"""
+QUESTION_MARKER = "\n\nQuestion: "
+register_prompt_prefix(PROMPT_HEADER, context_end=QUESTION_MARKER)
+
+def build_prompt(user_query: str) -> str:
+    return build_prompts([user_query])[0]
+
+def build_prompts(user_queries: list[str]) -> list[str]:
+    """Prompts for a batch of queries, with retrieval done for the whole batch at once."""
+    queries = [clean_input(q) for q in user_queries]
+    contexts = retrieve_context_many(queries)
+    return [_prompt(query, context) for query, context in zip(queries, contexts)]
+
+async def abuild_prompts(user_queries: list[str]) -> list[str]:
+    """build_prompts on a worker thread: query embedding and index search never block the event loop."""
+    return await asyncio.to_thread(build_prompts, user_queries)
 
-Question: {query}
+def _prompt(query: str, context: str) -> str:
+    return f"""{PROMPT_HEADER}{context}{QUESTION_MARKER}{query}
 Answer in simple, short, and local-friendly English or Hindi."""
 
+async def run_chatbot_pipeline(user_query: str, use_cache: bool = True) -> str:
+    if use_cache:
+        cached = await reply_cache.aget(user_query)
+        if cached is not None:
+            return cached
+    else:
+        reply_cache.record_bypass()
+
+    prompt = (await abuild_prompts([user_query]))[0]
     response = await get_hf_response(prompt)
+    if use_cache:
+        reply_cache.put(user_query, response)
     return response
+
+async def run_chatbot_pipeline_many(user_queries: list[str], use_cache: bool = True) -> list[str]:
+    """
+    run_chatbot_pipeline for a batch: cache lookups per query, then one
+    retrieval pass and one scheduler submission for the distinct misses.
+    Replies come back in input order.
+    """
+    replies = [None] * len(user_queries)
+    if use_cache:
+        for i, query in enumerate(user_queries):
+            replies[i] = await reply_cache.aget(query)
+    else:
+        for _ in user_queries:
+            reply_cache.record_bypass()
+
+    # Queries that normalize the same are generated once
+    misses: dict[str, list[int]] = {}
+    for i, reply in enumerate(replies):
+        if reply is None:
+            misses.setdefault(normalize_query(user_queries[i]), []).append(i)
+    if misses:
+        firsts = [positions[0] for positions in misses.values()]
+        generated = await get_hf_responses(await abuild_prompts([user_queries[i] for i in firsts]))
+        for positions, response in zip(misses.values(), generated):
+            for i in positions:
+                replies[i] = response
+            if use_cache:
+                reply_cache.put(user_queries[positions[0]], response)
+    return replies
+
+async def stream_chatbot_pipeline(user_query: str):
+    """Same pipeline as run_chatbot_pipeline, yielding reply tokens as they arrive."""
+    prompt = (await abuild_prompts([user_query]))[0]
+    async for token in stream_hf_response(prompt):
+        yield token
@@ -0,0 +1,195 @@
+# backend/chatbot/memory.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Tuple
+
+from chatbot.bm25 import tokenize
+from chatbot.text_match import compile_phrases
+from chatbot.utils import format_chat_history
+
+# ===============================================================
+# 🧠 Conversation memory
+# The last few turns per user, kept in process so a chat request
+# normally needs no history query at all. On a miss the turns are
+# loaded once from the database (indexed, LIMIT N). Prompts only
+# get the newest turns that fit in a token budget.
+#
+# History is only attached to queries that read like follow-ups
+# ("what about wheat?", "how much of it?") and only from turns in
+# the current session, so standalone questions keep using the
+# reply cache and single-flight.
+#
+# Per process: with several workers a user's memory can miss a
+# turn served by another worker until it's evicted and reloaded.
+# ===============================================================
+
+CHAT_MEMORY_TURNS = int(os.getenv("CHAT_MEMORY_TURNS", "6"))
+CHAT_MEMORY_TOKENS = int(os.getenv("CHAT_MEMORY_TOKENS", "768"))
+CHAT_MEMORY_USERS = int(os.getenv("CHAT_MEMORY_USERS", "10000"))
+CHAT_MEMORY_SESSION_SECONDS = float(os.getenv("CHAT_MEMORY_SESSION_SECONDS", "1800"))
+CHAT_MEMORY_FOLLOWUPS_ONLY = os.getenv("CHAT_MEMORY_FOLLOWUPS_ONLY", "true").lower() == "true"
+
+Turn = Tuple[str, str]
+# (query, reply, created_at) as loaded from the messages table, oldest first
+TurnLoader = Callable[[str, int], Awaitable[List[Tuple[str, str, datetime]]]]
+
+# Words that refer back to the previous turn
+REFERENCES = [
+    "it", "its", "this", "that", "these", "those", "them", "they", "same", "above", "previous",
+    "earlier", "you said", "isme", "isko", "iska", "iske", "usme", "usko", "uska", "uske", "ye",
+    "yeh", "wo", "woh", "wahi", "इस", "इसमें", "इसे", "इसका", "उस", "उसमें", "उसे", "उसका", "यह", "वह", "वही",
+]
+# Openers that continue the previous question
+CONTINUATIONS = [
+    "and", "also", "then", "so", "but", "what about", "how about", "instead",
+    "aur", "phir", "fir", "to", "lekin", "और", "फिर", "तो", "लेकिन",
+]
+# Question words, auxiliaries and generic verbs: what's left is the query's own subject
+FUNCTION_WORDS = set("""
+what which when where why how much many is are was were be been do does did can could should would will
+shall may might i me my we our you your he she the a an of to in on for with at from by about as or
+not no yes more less any some other need use used apply give get take put make please ok okay
+kya kab kaise kaisa kitna kitni kitne kyu kyon kyun kaun kahan hai hain tha thi ho hoga hogi me mein
+ka ki ke ko se par bhi karna karein kare karu dena dale dalna chahiye sakte sakta mujhe hum aap
+क्या कब कैसे कितना कितनी कितने क्यों कौन कहाँ है हैं था थी हो में का की के को से पर भी करें करना डालें चाहिए
+""".split())
+_REFERENCE_WORDS = {t for phrase in REFERENCES for t in tokenize(phrase)}
+_REFERENCE = compile_phrases(REFERENCES)
+_CONTINUATION = compile_phrases(CONTINUATIONS)
+
+
+def is_follow_up(query: str) -> bool:
+    """Whether the query only makes sense with the previous turn(s)."""
+    tokens = tokenize(query)
+    opener = " ".join(tokens[:2])
+    if _CONTINUATION.match(opener) or _REFERENCE.match(opener):
+        return True  # "and wheat?", "what about rabi", "isme kitna pani"
+    subject = [t for t in tokens if t not in FUNCTION_WORDS and t not in _REFERENCE_WORDS]
+    if not subject:
+        return True  # "why?", "how much?"
+    # A reference later on only counts when the query barely names anything itself:
+    # "how much water does it need" vs "is it safe to spray urea on wet leaves"
+    return len(subject) <= 1 and _REFERENCE.search(query) is not None
+
+
+def history_digest(history: str) -> str:
+    """Short key for a history prompt, so cache and single-flight keys stay small."""
+    return hashlib.sha1(history.encode("utf-8")).hexdigest()[:16] if history else ""
+
+
+def _timestamp(created_at: datetime) -> float:
+    # created_at is stored as naive UTC
+    return created_at.replace(tzinfo=timezone.utc).timestamp()
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap tokenizer-free estimate (~4 characters per token for English/Hinglish)."""
+    return len(text) // 4 + 1
+
+
+def fit_turns(turns: List[Turn], max_tokens: int) -> List[Turn]:
+    """Newest turns whose combined size fits max_tokens, oldest first."""
+    kept = []
+    used = 0
+    for query, reply in reversed(turns):
+        # Matches the "User: ...\nAssistant: ...\n" framing of format_chat_history
+        cost = estimate_tokens(query) + estimate_tokens(reply) + 4
+        if used + cost > max_tokens:
+            break
+        kept.append((query, reply))
+        used += cost
+    kept.reverse()
+    return kept
+
+
+class ConversationMemory:
+    def __init__(
+        self,
+        max_turns: int = CHAT_MEMORY_TURNS,
+        max_tokens: int = CHAT_MEMORY_TOKENS,
+        max_users: int = CHAT_MEMORY_USERS,
+        session_seconds: float = CHAT_MEMORY_SESSION_SECONDS,
+        follow_ups_only: bool = CHAT_MEMORY_FOLLOWUPS_ONLY,
+    ):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.max_users = max(1, max_users)
+        self.session_seconds = session_seconds
+        self.follow_ups_only = follow_ups_only
+        # external_id -> deque of (query, reply, unix time)
+        self._turns: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.standalone = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_turns > 0 and self.max_tokens > 0
+
+    async def turns(self, external_id: str, load: TurnLoader) -> List[Turn]:
+        """The user's turns in the current session, loading them with `load(external_id, n)` on a miss."""
+        if not self.enabled:
+            return []
+        with self._lock:
+            cached = self._turns.get(external_id)
+            if cached is not None:
+                self._turns.move_to_end(external_id)
+                self.hits += 1
+                return self._in_session(cached)
+
+        loaded = [(query, reply, _timestamp(at)) for query, reply, at in await load(external_id, self.max_turns)]
+        with self._lock:
+            self.loads += 1
+            # Another request may have loaded (and appended to) it meanwhile
+            cached = self._turns.setdefault(external_id, deque(loaded, maxlen=self.max_turns))
+            self._turns.move_to_end(external_id)
+            while len(self._turns) > self.max_users:
+                self._turns.popitem(last=False)
+            return self._in_session(cached)
+
+    def _in_session(self, turns) -> List[Turn]:
+        if self.session_seconds <= 0:
+            return [(query, reply) for query, reply, _ in turns]
+        since = time.time() - self.session_seconds
+        return [(query, reply) for query, reply, at in turns if at >= since]
+
+    def append(self, external_id: str, query: str, reply: str):
+        """Record a committed turn. Users not in memory are skipped; their next load includes it."""
+        with self._lock:
+            cached = self._turns.get(external_id)
+            if cached is not None:
+                cached.append((query, reply, time.time()))
+
+    def discard(self, external_id: str):
+        with self._lock:
+            self._turns.pop(external_id, None)
+
+    async def context(self, external_id: str, query: str, load: TurnLoader) -> str:
+        """
+        Formatted history for the prompt, bounded by the token budget. ""
+        for standalone questions and users without a turn in this session.
+        """
+        if not self.enabled:
+            return ""
+        if self.follow_ups_only and not is_follow_up(query):
+            with self._lock:
+                self.standalone += 1
+            return ""
+        return format_chat_history(fit_turns(await self.turns(external_id, load), self.max_tokens))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"users": len(self._turns), "hits": self.hits, "loads": self.loads, "standalone": self.standalone}
+
+
+def with_history(history: str, query: str) -> str:
+    """Model input for a follow-up question: the earlier turns, then the new one."""
+    return f"{history}User: {query}\nAssistant:" if history else query
+
+
+memory = ConversationMemory()
@@ -0,0 +1,80 @@
+# backend/chatbot/model_registry.py
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable
+
+# ===============================================================
+# 📦 Model Registry
+# Models and embeddings register a loader instead of loading at
+# import time. They are loaded on first use, or all at once by
+# warm_up() (FastAPI startup, or before forking workers so they
+# share one copy of the weights).
+# ===============================================================
+
+
+class _Entry:
+    def __init__(self, loader: Callable[[], Any]):
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.value: Any = None
+        self.state = "registered"  # registered | loading | ready | failed
+        self.load_seconds: float | None = None
+        self.error: str | None = None
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """Register a zero-argument loader under `name` (replaces any previous one)."""
+        self._entries[name] = _Entry(loader)
+
+    def get(self, name: str) -> Any:
+        """Return the loaded object, loading it on first use."""
+        entry = self._entries[name]
+        if entry.state == "ready":
+            return entry.value
+        with entry.lock:
+            # Another thread may have finished loading while we waited
+            if entry.state != "ready":
+                self._load(name, entry)
+            return entry.value
+
+    def _load(self, name: str, entry: _Entry):
+        print(f"🔁 Loading {name} ...")
+        entry.state = "loading"
+        start = time.perf_counter()
+        try:
+            entry.value = entry.loader()
+        except Exception as e:
+            entry.state = "failed"
+            entry.error = str(e)
+            entry.load_seconds = round(time.perf_counter() - start, 3)
+            print(f"❌ Failed to load {name}:", e)
+            raise
+        entry.state = "ready"
+        entry.error = None
+        entry.load_seconds = round(time.perf_counter() - start, 3)
+        print(f"✅ {name} loaded in {entry.load_seconds}s")
+
+    def warm_up(self, names: Iterable[str] | None = None):
+        """Load the given (default: all) registered models; failures are recorded, not raised."""
+        for name in list(names or self._entries):
+            try:
+                self.get(name)
+            except Exception:
+                pass
+
+    def is_loaded(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.state == "ready"
+
+    def status(self) -> dict:
+        return {
+            name: {"state": e.state, "load_seconds": e.load_seconds, "error": e.error}
+            for name, e in self._entries.items()
+        }
+
+
+registry = ModelRegistry()
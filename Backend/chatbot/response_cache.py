@@ -0,0 +1,215 @@
+# backend/chatbot/response_cache.py
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List
+
+from chatbot.safety_filters import clean_input
+
+# ===============================================================
+# 🗃️ Reply Cache
+# Sits in front of the model. Exact tier: normalized, sanitized
+# query -> reply. Optional semantic tier: reuse a cached reply when
+# a new query's MiniLM embedding is close enough to a cached one.
+# Bounded (LRU) with a TTL on every entry.
+# ===============================================================
+
+CACHE_MAX_ENTRIES = int(os.getenv("REPLY_CACHE_MAX_ENTRIES", "2048"))
+CACHE_TTL_SECONDS = float(os.getenv("REPLY_CACHE_TTL_SECONDS", "86400"))
+SEMANTIC_CACHE = os.getenv("REPLY_CACHE_SEMANTIC", "false").lower() == "true"
+SEMANTIC_THRESHOLD = float(os.getenv("REPLY_CACHE_SIMILARITY", "0.92"))
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " ?!.,;:\"'"
+
+EmbedFn = Callable[[str], List[float]]
+
+
+def normalize_query(query: str) -> str:
+    """Cache key: PII-scrubbed, lower-cased, whitespace-collapsed query."""
+    text = _WHITESPACE.sub(" ", clean_input(query)).strip(_EDGE_PUNCTUATION)
+    return text.lower()
+
+
+def cache_key(query: str, context: str = "") -> str:
+    """normalize_query, qualified by a conversation digest for follow-up questions."""
+    key = normalize_query(query)
+    return f"{key}#{context}" if context else key
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+        semantic: bool = SEMANTIC_CACHE,
+        threshold: float = SEMANTIC_THRESHOLD,
+        embed_fn: EmbedFn | None = None,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl_seconds
+        self.semantic = semantic
+        self.threshold = threshold
+        self._embed_fn = embed_fn
+        self._lock = threading.Lock()
+        # key -> (reply, expires_at, slot); slot indexes the vector matrix
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._vectors = None
+        self._slot_keys: list = [None] * self.max_entries
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        # Embeddings computed on a miss, reused when the reply is stored
+        self._pending_vectors: "OrderedDict[str, object]" = OrderedDict()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ------------------------------
+    # 🔍 Lookup
+    # ------------------------------
+    def get(self, query: str, context: str = "") -> str | None:
+        """
+        Exact tier first, then (if enabled) the semantic tier. `context`
+        (a history digest) keys follow-ups apart; those skip the semantic tier.
+        """
+        key = cache_key(query, context)
+        reply = self._get_exact(key)
+        if reply is None and self.semantic and not context:
+            reply = self._get_semantic(key)
+        if reply is None:
+            with self._lock:
+                self.misses += 1
+        return reply
+
+    async def aget(self, query: str, context: str = "") -> str | None:
+        """Like get(), but embeds on a worker thread so the event loop never waits on the model."""
+        key = cache_key(query, context)
+        reply = self._get_exact(key)
+        if reply is None and self.semantic and not context:
+            reply = await asyncio.to_thread(self._get_semantic, key)
+        if reply is None:
+            with self._lock:
+                self.misses += 1
+        return reply
+
+    def _get_exact(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            reply, expires_at, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return reply
+
+    def _get_semantic(self, key: str) -> str | None:
+        import numpy as np
+
+        vector = self._embed(key)
+        with self._lock:
+            self._pending_vectors[key] = vector
+            while len(self._pending_vectors) > 256:
+                self._pending_vectors.popitem(last=False)
+            if self._vectors is None or not self._entries:
+                return None
+            # Free slots hold zero vectors, so they never clear the threshold
+            sims = self._vectors @ vector
+            slot = int(np.argmax(sims))
+            if sims[slot] < self.threshold:
+                return None
+            match = self._slot_keys[slot]
+            reply, expires_at, _ = self._entries[match]
+            if expires_at < time.monotonic():
+                self._remove(match)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(match)
+            self.semantic_hits += 1
+            return reply
+
+    # ------------------------------
+    # 💾 Store
+    # ------------------------------
+    def put(self, query: str, reply: str, context: str = ""):
+        key = cache_key(query, context)
+        vector = None
+        if self.semantic and not context:
+            with self._lock:
+                vector = self._pending_vectors.pop(key, None)
+            if vector is None:
+                vector = self._embed(key)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+            slot = None
+            if vector is not None:
+                slot = self._free_slots.pop()
+                if self._vectors is None:
+                    import numpy as np
+                    self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                self._vectors[slot] = vector
+                self._slot_keys[slot] = key
+            self._entries[key] = (reply, time.monotonic() + self.ttl, slot)
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+            self._pending_vectors.clear()
+
+    # ------------------------------
+    # 🧰 Internals
+    # ------------------------------
+    def _remove(self, key: str):
+        _, _, slot = self._entries.pop(key)
+        if slot is not None:
+            self._vectors[slot] = 0.0
+            self._slot_keys[slot] = None
+            self._free_slots.append(slot)
+
+    def _embed(self, text: str):
+        import numpy as np
+
+        embed_fn = self._embed_fn
+        if embed_fn is None:
+            from chatbot.retriever import embed_query
+            embed_fn = embed_query
+        vector = np.asarray(embed_fn(text), dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+
+reply_cache = ResponseCache()
@@ -1,17 +1,199 @@
 # backend/chatbot/retriever.py
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import FAISS
 import os
+import threading
+from collections import OrderedDict
+from typing import List
 
-embeddings = SentenceTransformerEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+import numpy as np
 
-if os.path.exists("data/vector_store"):
-    vector_db = FAISS.load_local("data/vector_store", embeddings)
-else:
-    vector_db = None
+from chatbot.bm25 import BM25Index, reciprocal_rank_fusion
+from chatbot.model_registry import registry
+from chatbot.index_manager import IndexManager, VECTOR_INDEX_PATH
+from chatbot.response_cache import normalize_query
+from metrics import stage
 
-def retrieve_context(query: str):
+# Legacy LangChain FAISS store, used only when no managed index has been published
+VECTOR_STORE_PATH = "data/vector_store"
+# Must match the model the index was built with (see ingest_corpus.py)
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense")  # dense | hybrid | keyword
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+
+def load_embeddings():
+    from langchain_community.embeddings import SentenceTransformerEmbeddings
+    return SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+
+def load_vector_index():
+    if not os.path.exists(os.path.join(VECTOR_INDEX_PATH, "CURRENT")):
+        return None
+    manager = IndexManager(VECTOR_INDEX_PATH)
+    manager.load()
+    return manager
+
+def load_vector_store():
+    if not os.path.exists(VECTOR_STORE_PATH):
+        return None
+    from langchain_community.vectorstores import FAISS
+    return FAISS.load_local(VECTOR_STORE_PATH, registry.get("embeddings"))
+
+# Loaded on first use or by registry.warm_up(), not at import
+registry.register("embeddings", load_embeddings)
+registry.register("vector_index", load_vector_index)
+registry.register("vector_store", load_vector_store)
+
+
+# ------------------------------
+# 🧠 Query embeddings (LRU cached)
+# ------------------------------
+class EmbeddingLRU:
+    """normalized query -> float32 embedding."""
+
+    def __init__(self, max_entries: int = QUERY_EMBEDDING_CACHE_SIZE):
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: List[str]) -> dict:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items):
+        with self._lock:
+            for key, vector in items:
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+query_embeddings = EmbeddingLRU()
+
+def embed_queries(texts: List[str]) -> np.ndarray:
+    """MiniLM embeddings for many queries; cache misses are encoded in one forward pass."""
+    keys = [normalize_query(text) for text in texts]
+    found = query_embeddings.get_many(keys)
+    missing = list(dict.fromkeys(key for key in keys if key not in found))
+    if missing:
+        vectors = np.asarray(registry.get("embeddings").embed_documents(missing), dtype=np.float32)
+        fresh = list(zip(missing, vectors))
+        query_embeddings.put_many(fresh)
+        found.update(fresh)
+    return np.stack([found[key] for key in keys])
+
+def embed_query(text: str) -> np.ndarray:
+    """MiniLM sentence embedding shared with the semantic reply cache."""
+    return embed_queries([text])[0]
+
+
+# ------------------------------
+# 🔤 Keyword index over the live snapshot
+# ------------------------------
+_bm25_lock = threading.Lock()
+# (snapshot, BM25 index, docs): built together and swapped in one assignment,
+# so a reader never pairs an index with another snapshot's docs
+_bm25: tuple | None = None
+
+def _keyword_index(snapshot):
+    """BM25 over the snapshot's chunks, rebuilt when a new snapshot is swapped in."""
+    global _bm25
+    current = _bm25
+    if current is None or current[0] is not snapshot:
+        # One rebuild at a time; other queries keep using the previous keyword index
+        if _bm25_lock.acquire(blocking=current is None):
+            try:
+                if _bm25 is None or _bm25[0] is not snapshot:
+                    docs = list(snapshot.docs.values())
+                    _bm25 = (snapshot, BM25Index([doc["text"] for doc in docs]), docs)
+            finally:
+                _bm25_lock.release()
+            current = _bm25
+    _, index, docs = current
+    return index, docs
+
+
+# ------------------------------
+# 🔎 Retrieval
+# ------------------------------
+def _search_many(index: IndexManager, queries: List[str], k: int, mode: str) -> List[List[dict]]:
+    snapshot = index.snapshot
+    if snapshot is None:
+        return [[] for _ in queries]
+    candidates = max(4 * k, 20) if mode == "hybrid" else k
+
+    dense = [[] for _ in queries]
+    if mode in ("dense", "hybrid"):
+        dense = [[doc for doc, _ in hits] for hits in index.search(embed_queries(queries), k=candidates)]
+    if mode == "dense":
+        return dense
+
+    bm25, docs = _keyword_index(snapshot)
+    results = []
+    for query, dense_docs in zip(queries, dense):
+        keyword_docs = [docs[position] for position, _ in bm25.search(query, candidates)]
+        if mode == "keyword":
+            results.append(keyword_docs)
+            continue
+        by_key = {doc["key"]: doc for doc in keyword_docs + dense_docs}
+        fused = reciprocal_rank_fusion(
+            [[doc["key"] for doc in dense_docs], [doc["key"] for doc in keyword_docs]], k
+        )
+        results.append([by_key[key] for key in fused])
+    return results
+
+def retrieve_context_many(queries: List[str], k: int = RETRIEVAL_K, mode: str = RETRIEVAL_MODE) -> List[str]:
+    """Context strings for a batch of queries: one embedding pass and one index search."""
+    if not queries:
+        return []
+    with stage("retrieve"):
+        return _retrieve_many(queries, k, mode)
+
+def _retrieve_many(queries: List[str], k: int, mode: str) -> List[str]:
+    index = registry.get("vector_index")
+    if index is not None:
+        return ["\n".join(doc["text"] for doc in docs) for docs in _search_many(index, queries, k, mode)]
+
+    vector_db = registry.get("vector_store")
     if not vector_db:
-        return ""
-    docs = vector_db.similarity_search(query, k=3)
-    return "\n".join([d.page_content for d in docs])
+        return ["" for _ in queries]
+    return ["\n".join([d.page_content for d in vector_db.similarity_search(query, k=k)]) for query in queries]
+
+def retrieve_context(query: str):
+    return retrieve_context_many([query])[0]
+
+def context_version() -> str | None:
+    """Published index snapshot replies are grounded on; changes whenever the corpus does."""
+    if not registry.is_loaded("vector_index"):
+        return None
+    index = registry.get("vector_index")
+    snapshot = index.snapshot if index else None
+    return snapshot.name if snapshot else None
+
+def retrieval_stats() -> dict:
+    index = registry.get("vector_index") if registry.is_loaded("vector_index") else None
+    return {
+        "mode": RETRIEVAL_MODE,
+        "query_embeddings": query_embeddings.stats(),
+        "index": index.stats() if index else None,
+    }
@@ -1,9 +1,182 @@
 # backend/chatbot/safety_filters.py
+import os
 import re
+import threading
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+from chatbot.text_match import WORD_CHARS, compile_phrases, normalize_phrase, trie_pattern
+
+# ===============================================================
+# 🛡️ Safety filter engine
+# Every PII rule plus the blocklist is compiled into ONE regex of
+# named alternatives, so scrubbing is a single left-to-right pass
+# whatever the number of rules. The same engine scrubs streamed
+# model output incrementally (StreamScrubber), holding back only the
+# trailing word / digit run that could still turn into a match.
+# ===============================================================
+
+SAFETY_BLOCKLIST_PATH = os.getenv(
+    "SAFETY_BLOCKLIST_PATH", os.path.join(os.path.dirname(__file__), "data", "blocklist.txt")
+)
+# Upper bound on the tail held back while streaming (raised to the longest possible match)
+SAFETY_STREAM_HOLDBACK = int(os.getenv("SAFETY_STREAM_HOLDBACK", "96"))
+PII_MAX_MATCH_CHARS = 87
+
+# (label, pattern) in priority order: at one position the first alternative
+# that matches wins, so specific formats come before generic digit runs.
+# Rules don't need a leading boundary: the engine only tries them where a
+# token starts (TOKEN_START). Digit rules open with a (?=[\d+]) guard so the
+# common case, a letter, is rejected before the alternation is walked.
+# Quantifiers are bounded (longest: EMAIL, 87 chars) so streamed text only
+# needs a short holdback.
+PII_RULES: List[Tuple[str, str]] = [
+    ("EMAIL", r"[\w.+-]{1,40}@[A-Za-z0-9-]{1,24}(?:\.[A-Za-z0-9-]{2,10}){1,2}\b"),
+    ("PAN", r"[A-Z]{5}\d{4}[A-Z]\b"),
+    ("IFSC", r"[A-Z]{4}0[A-Z0-9]{6}\b"),
+    ("AADHAAR", r"(?=\d)\d{4}[ -]?\d{4}[ -]?\d{4}(?!\d)"),
+    ("PHONE", r"(?=[\d+])(?:\+?91[ -]?|0)?\d{5}[ -]?\d{5}(?!\d)"),
+    ("BANK_ACCOUNT", r"(?=\d)\d{9,18}(?!\d)"),
+]
+
+# Model replies are full of spaced numbers ("yields 2021 2022 2023", "price 10000 20000"):
+# there only unbroken Aadhaar / phone numbers are redacted
+OUTPUT_PII_RULES: List[Tuple[str, str]] = [
+    ("EMAIL", PII_RULES[0][1]),
+    ("PAN", PII_RULES[1][1]),
+    ("IFSC", PII_RULES[2][1]),
+    ("AADHAAR", r"(?=\d)\d{12}(?!\d)"),
+    ("PHONE", r"(?=[\d+])(?:\+?91[ -]?|0)?\d{10}(?!\d)"),
+    ("BANK_ACCOUNT", PII_RULES[5][1]),
+]
+
+# Every match starts at a token boundary; testing that once up front skips
+# mid-word positions without trying any alternative
+TOKEN_START = rf"(?<![{WORD_CHARS}.+-])"
+
+
+def load_blocklist(path: str = SAFETY_BLOCKLIST_PATH) -> List[str]:
+    """One term or phrase per line; blank lines and # comments are ignored."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    except FileNotFoundError:
+        return []
+
+
+class SafetyFilter:
+    def __init__(self, rules: List[Tuple[str, str]] = PII_RULES, blocklist: Iterable[str] = ()):
+        blocklist = list(blocklist)
+        alternatives = [f"(?P<{label}>{pattern})" for label, pattern in rules]
+        # TOKEN_START already gives the leading word boundary, only the trailing one is added
+        blocked = compile_phrases(blocklist, whole_words=False)
+        if blocked is not None:
+            # Inline flag keeps the blocklist case-insensitive without loosening PAN/IFSC
+            alternatives.append(f"(?P<BLOCKED>(?i:{blocked.pattern})(?![{WORD_CHARS}]))")
+        self.pattern = re.compile(f"{TOKEN_START}(?:{'|'.join(alternatives)})")
+        self.labels = [label for label, _ in rules] + (["BLOCKED"] if blocked is not None else [])
+        # Streaming is exact as long as the holdback covers the longest possible match
+        # (blocklist phrases may use extra whitespace between words, hence the slack)
+        self.max_match_chars = max([PII_MAX_MATCH_CHARS] + [2 * len(term) for term in blocklist])
+        # Trailing text a match could still grow from: a run of digits (with the separators
+        # numbers use), an e-mail or any word, after the opening words of a blocklist phrase
+        leads = {" ".join(words[:i]) for words in (normalize_phrase(t).split() for t in blocklist)
+                 for i in range(1, len(words))}
+        lead = rf"(?:(?i:{trie_pattern(leads)})\s+)?" if leads else ""
+        self.open_tail = re.compile(
+            rf"{lead}(?:[\d+][\d +-]*|[{WORD_CHARS}.+-]*@[{WORD_CHARS}.-]*|[{WORD_CHARS}.+-]*)$"
+        )
+        self._lock = threading.Lock()
+        self.counts: Counter = Counter()
+
+    def record(self, found: Counter):
+        if found:
+            with self._lock:
+                self.counts.update(found)
+
+    def scrub(self, text: str) -> str:
+        """Replace every PII / blocked span with its [LABEL] in one pass."""
+        found = Counter()
+
+        def replace(match):
+            found[match.lastgroup] += 1
+            return f"[{match.lastgroup}]"
+
+        text = self.pattern.sub(replace, text)
+        self.record(found)
+        return text
+
+    def stream(self, holdback: int | None = None) -> "StreamScrubber":
+        return StreamScrubber(self, holdback or max(SAFETY_STREAM_HOLDBACK, self.max_match_chars))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"rules": len(self.labels), "redactions": dict(self.counts)}
+
+
+class StreamScrubber:
+    """
+    Incremental scrubbing for streamed text: feed() returns the part that is
+    final, flush() the rest. Everything before the earliest position where a
+    match could still start (the trailing word, number or e-mail, at most
+    `holdback` characters) is released right away.
+    """
+
+    # Emitted characters kept as look-behind context for \b / (?<!\d)
+    CONTEXT = 1
+
+    def __init__(self, engine: SafetyFilter, holdback: int):
+        self.engine = engine
+        self.holdback = max(1, holdback)
+        self._context = ""
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        self._pending += chunk
+        # No match is longer than the holdback, so a run longer than that can't hide one's start
+        start = max(0, len(self._pending) - self.holdback)
+        limit = self.engine.open_tail.search(self._pending, start).start()
+        return self._emit(limit) if limit else ""
+
+    def flush(self) -> str:
+        return self._emit(len(self._pending), final=True)
+
+    def _emit(self, limit: int, final: bool = False) -> str:
+        buffer = self._context + self._pending
+        offset = len(self._context)
+        out = []
+        found = Counter()
+        position = offset
+        cut = offset + limit
+        for match in self.engine.pattern.finditer(buffer, offset):
+            if match.start() >= cut:
+                break
+            if match.end() > cut and not final:
+                # May still grow with the next chunk: hold it back from its start
+                cut = match.start()
+                break
+            out.append(buffer[position:match.start()])
+            out.append(f"[{match.lastgroup}]")
+            found[match.lastgroup] += 1
+            position = match.end()
+        out.append(buffer[position:cut])
+        self.engine.record(found)
+
+        emitted = buffer[offset:cut]
+        self._context = (self._context + emitted)[-self.CONTEXT:] if self.CONTEXT else ""
+        self._pending = buffer[cut:]
+        return "".join(out)
+
+
+safety_filter = SafetyFilter(blocklist=load_blocklist())
+output_filter = SafetyFilter(OUTPUT_PII_RULES, blocklist=load_blocklist())
+
 
 def clean_input(text: str) -> str:
     """Remove potential PII and unsafe words"""
-    text = re.sub(r'\b\d{10}\b', '[PHONE]', text)
-    text = re.sub(r'[A-Z]{5}\d{4}[A-Z]', '[PAN]', text)
-    text = re.sub(r'\b\d{12}\b', '[AADHAAR]', text)
-    return text
+    return safety_filter.scrub(text)
+
+
+def scrub_output(text: str) -> str:
+    """Model replies, so PII echoed or hallucinated by the model never reaches users."""
+    return output_filter.scrub(text)
@@ -0,0 +1,185 @@
+# backend/chatbot/scheduler.py
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterable, List
+
+# ===============================================================
+# ⏱️ Inference Scheduler
+# Owns the model on a dedicated thread pool so generation never
+# blocks the event loop, and groups concurrent prompts into
+# micro-batches (up to MAX_BATCH_SIZE, waiting at most MAX_WAIT_MS).
+# ===============================================================
+
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+
+BatchFn = Callable[[List[str]], List[str]]
+StreamFn = Callable[[str], Iterable[str]]
+
+
+class InferenceScheduler:
+    """
+    Collects prompts submitted from async handlers, runs them through
+    `batch_fn(prompts) -> replies` on the inference pool and resolves
+    one future per prompt. An optional `stream_fn(prompt) -> tokens`
+    serves token streaming from the same pool.
+    """
+
+    def __init__(
+        self,
+        batch_fn: BatchFn,
+        stream_fn: StreamFn | None = None,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+        workers: int = WORKERS,
+    ):
+        self.batch_fn = batch_fn
+        self.stream_fn = stream_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.workers = max(1, workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self.batches = 0
+        self.prompts = 0
+        self.errors = 0  # failed batch / stream calls into the model
+
+    # ------------------------------
+    # 🔄 Lifecycle
+    # ------------------------------
+    def start(self):
+        """Spawn one batching loop per worker on the running event loop."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    # ------------------------------
+    # 📨 Submission
+    # ------------------------------
+    async def submit(self, prompt: str) -> str:
+        """Queue a prompt and wait for its generated reply."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((prompt, future))
+        return await future
+
+    async def submit_many(self, prompts: List[str]) -> List[str]:
+        return list(await asyncio.gather(*(self.submit(p) for p in prompts)))
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Yield reply tokens as the model produces them. Generation runs on
+        the inference pool; tokens are handed back to the event loop
+        through a queue. Backends without streaming yield one chunk.
+        """
+        if self.stream_fn is None:
+            yield await self.submit(prompt)
+            return
+
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+        done = object()
+
+        def produce():
+            stream = None
+            try:
+                stream = self.stream_fn(prompt)
+                for token in stream:
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(tokens.put_nowait, token)
+            except Exception as e:
+                self.errors += 1
+                loop.call_soon_threadsafe(tokens.put_nowait, e)
+            finally:
+                # Closing a backend stream stops its generate() call too
+                if hasattr(stream, "close"):
+                    stream.close()
+                loop.call_soon_threadsafe(tokens.put_nowait, done)
+
+        loop.run_in_executor(self.executor, produce)
+        try:
+            while True:
+                item = await tokens.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Client went away mid-stream: produce() closes the backend stream at the
+            # next token, which ends its generate() call
+            cancelled.set()
+
+    # ------------------------------
+    # 🧺 Batching loop
+    # ------------------------------
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Callers that gave up while queued don't need a generation
+        return [(p, f) for p, f in batch if not f.done()]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            prompts = [p for p, _ in batch]
+            try:
+                replies = await loop.run_in_executor(self.executor, self.batch_fn, prompts)
+                if len(replies) != len(prompts):
+                    raise RuntimeError(f"batch_fn returned {len(replies)} replies for {len(prompts)} prompts")
+            except Exception as e:
+                self.errors += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.prompts += len(prompts)
+            for (_, future), reply in zip(batch, replies):
+                if not future.done():
+                    future.set_result(reply)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "batches": self.batches,
+            "prompts": self.prompts,
+            "errors": self.errors,
+            "avg_batch_size": round(self.prompts / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,90 @@
+# backend/chatbot/singleflight.py
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+# ===============================================================
+# 🛬 Single-flight request coalescing
+# When many users ask the same thing at once (e.g. right after a
+# weather alert), only the first caller (the leader) starts a
+# generation; identical requests arriving while it runs await the
+# same task. Every caller still stores its own Message and hash.
+#
+# The shared task is shielded: a caller that times out or whose
+# client disconnects stops waiting, but the generation goes on for
+# the others. It's cancelled only when nobody waits for it any more.
+# ===============================================================
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+SINGLEFLIGHT_TIMEOUT_SECONDS = float(os.getenv("SINGLEFLIGHT_TIMEOUT_SECONDS", "120"))
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, timeout: float = SINGLEFLIGHT_TIMEOUT_SECONDS, enabled: bool = SINGLEFLIGHT_ENABLED):
+        self.timeout = timeout if timeout > 0 else None
+        self.enabled = enabled
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.cancelled = 0  # shared generations abandoned by every waiter
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Result of fn(), shared with every concurrent caller using the same key."""
+        if not self.enabled:
+            return await fn()
+
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task, key=key, call=call: self._finished(key, call))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(call.task), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Last interested caller left (timeout or disconnect): stop the generation
+                call.task.cancel()
+                self.cancelled += 1
+
+    def _finished(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark the exception as retrieved; waiters that are still there re-raise it
+        if not call.task.cancelled():
+            call.task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        requests = self.leaders + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "in_flight": self.in_flight,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "coalesced_ratio": round(self.coalesced / requests, 3) if requests else 0.0,
+        }
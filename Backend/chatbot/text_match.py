@@ -0,0 +1,59 @@
+# backend/chatbot/text_match.py
+import re
+from typing import Iterable
+
+# ===============================================================
+# 🔤 Multi-phrase matching
+# Compiles any number of phrases into one regex whose alternation
+# is shaped like a trie (shared prefixes are tested once), so a
+# single left-to-right scan finds every phrase and the cost grows
+# with the text, not with the number of phrases.
+# ===============================================================
+
+# Word characters, including Devanagari vowel signs that \w leaves out
+WORD_CHARS = r"\w\u0900-\u097F"
+
+
+def _char(ch: str) -> str:
+    # Spaces inside a phrase match any run of whitespace
+    return r"\s+" if ch == " " else re.escape(ch)
+
+
+def trie_pattern(phrases: Iterable[str]) -> str:
+    """Regex source matching any of the phrases, longest alternative first at each branch."""
+    trie: dict = {}
+    for phrase in phrases:
+        if not phrase:
+            continue
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # end of a phrase
+
+    def build(node: dict) -> str:
+        alternatives = [_char(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ""
+        if len(alternatives) == 1 and "" not in node:
+            return alternatives[0]
+        body = f"(?:{'|'.join(alternatives)})"
+        # A phrase may end here, but longer ones are tried first
+        return body + "?" if "" in node else body
+
+    return build(trie)
+
+
+def compile_phrases(phrases: Iterable[str], ignore_case: bool = True, whole_words: bool = True) -> re.Pattern | None:
+    """One compiled matcher for all phrases (None when there are none)."""
+    phrases = sorted({normalize_phrase(p) if ignore_case else " ".join(p.split()) for p in phrases if p and p.strip()})
+    if not phrases:
+        return None
+    source = trie_pattern(phrases)
+    if whole_words:
+        source = rf"(?<![{WORD_CHARS}])(?:{source})(?![{WORD_CHARS}])"
+    return re.compile(source, re.IGNORECASE if ignore_case else 0)
+
+
+def normalize_phrase(phrase: str) -> str:
+    """Collapse whitespace and lower-case, the form phrases are compiled and looked up in."""
+    return " ".join(phrase.split()).lower()
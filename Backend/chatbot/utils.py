@@ -1,25 +1,9 @@
 """
 Utility helper functions for the chatbot agent.
 """
-import json
-import hashlib
-
-def canonical_record(user_id: str, query: str, reply: str) -> bytes:
-    """
-    Create a canonical JSON byte representation of a chat record
-    """
-    payload = json.dumps(
-        {"user_id": user_id, "query": query, "reply": reply},
-        ensure_ascii=False, separators=(",", ":"), sort_keys=True
-    )
-    return payload.encode("utf-8")
-
-def sha256_hex(data: bytes) -> str:
-    """
-    Return SHA256 hex digest of given bytes
-    """
-    return hashlib.sha256(data).hexdigest()
-
+# Record hashing lives in hashing.py; re-exported for existing imports
+from hashing import canonical_record, sha256_hex
+from chatbot.enrichment import enrichment
 
 from datetime import datetime
 
@@ -35,11 +19,10 @@ def format_chat_history(history: list) -> str:
             ("What is crop rotation?", "Crop rotation is...")
         ]
     """
-    formatted = ""
-    for user_msg, assistant_msg in history:
-        formatted += f"User: {user_msg}\n"
-        formatted += f"Assistant: {assistant_msg}\n"
-    return formatted
+    # One join instead of repeated += (quadratic on long histories)
+    return "".join(
+        f"User: {user_msg}\nAssistant: {assistant_msg}\n" for user_msg, assistant_msg in history
+    )
 
 
 def get_timestamp() -> str:
@@ -55,10 +38,5 @@ CROP_BY_SEASON = {
 }
 
 def heuristic_enrich(query: str, reply: str) -> str:
-    q = query.lower()
-    if "rainy" in q or "monsoon" in q:
-        tips = ", ".join(CROP_BY_SEASON["rainy"])
-        reply += f"\n\n🌧️ Monsoon-friendly crops: {tips}. Ensure raised beds and good drainage to avoid waterlogging."
-    if "fertilizer" in q and "rice" in q:
-        reply += "\n\n💡 Rice tip: Basal NPK 10:26:26 with split urea doses at tillering and panicle initiation; adjust by soil test."
-    return reply
+    """Append matching agronomy tips (rules in chatbot/data/enrichment_rules.json)."""
+    return enrichment.enrich(query, reply)
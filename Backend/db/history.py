@@ -0,0 +1,55 @@
+from datetime import datetime
+from typing import List, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Message, User
+
+# Keyset cursor: "<created_at ISO>|<message id>" of the last row on a page
+CURSOR_SEPARATOR = "|"
+
+
+def encode_cursor(created_at: datetime, message_id: str) -> str:
+    return f"{created_at.isoformat()}{CURSOR_SEPARATOR}{message_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Raises ValueError on a malformed cursor."""
+    created_at, message_id = cursor.split(CURSOR_SEPARATOR, 1)
+    return datetime.fromisoformat(created_at), message_id
+
+
+def _newest_first(external_id: str):
+    # Uses ix_messages_user_created; users.external_id is unique, so the join is one row
+    return (
+        select(Message.id, Message.query, Message.reply, Message.created_at)
+        .join(User, User.id == Message.user_id)
+        .where(User.external_id == external_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+    )
+
+
+async def history_page(
+    session: AsyncSession, external_id: str, before: str | None = None, limit: int = 50
+) -> Tuple[List[dict], str | None]:
+    """One page of a user's messages, newest first, and the cursor for the next (older) page."""
+    stmt = _newest_first(external_id)
+    if before is not None:
+        stmt = stmt.where(tuple_(Message.created_at, Message.id) < decode_cursor(before))
+    rows = (await session.execute(stmt.limit(limit))).all()
+    messages = [
+        {"message_id": id_, "query": query, "reply": reply, "created_at": created_at.isoformat()}
+        for id_, query, reply, created_at in rows
+    ]
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if len(rows) == limit else None
+    return messages, next_cursor
+
+
+async def recent_turns(
+    session: AsyncSession, external_id: str, limit: int
+) -> List[Tuple[str, str, datetime]]:
+    """The user's last `limit` (query, reply, created_at) turns, oldest first."""
+    stmt = _newest_first(external_id).with_only_columns(Message.query, Message.reply, Message.created_at).limit(limit)
+    rows = (await session.execute(stmt)).all()
+    return [(query, reply, created_at) for query, reply, created_at in reversed(rows)]
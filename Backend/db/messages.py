@@ -0,0 +1,37 @@
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Message
+from db.session import dialect_insert
+
+# (users.id, client_key) identifies an uploaded message across replays
+ClientKey = Tuple[str, str]
+
+
+async def find_by_client_keys(session: AsyncSession, keys: Iterable[ClientKey]) -> Dict[ClientKey, Message]:
+    """Messages already stored for these (user_id, client_key) pairs, in one query."""
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    stmt = select(Message).where(tuple_(Message.user_id, Message.client_key).in_(keys))
+    return {(m.user_id, m.client_key): m for m in (await session.execute(stmt)).scalars()}
+
+
+async def insert_messages(session: AsyncSession, rows: List[dict]) -> set:
+    """
+    One multi-row INSERT. Rows whose (user_id, client_key) was stored
+    meanwhile by a concurrent replay are skipped; returns the keys that
+    were actually inserted.
+    """
+    if not rows:
+        return set()
+    insert = dialect_insert(session)
+    stmt = (
+        insert(Message)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=[Message.user_id, Message.client_key])
+        .returning(Message.user_id, Message.client_key)
+    )
+    return set((await session.execute(stmt)).tuples().all())
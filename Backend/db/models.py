@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Text, DateTime, ForeignKey
+from sqlalchemy import String, Text, DateTime, ForeignKey, UniqueConstraint, Index
 from datetime import datetime
 from sqlalchemy import Column, Integer, String
 from sqlalchemy.orm import declarative_base
@@ -10,6 +10,8 @@ Base = declarative_base()
 
 class Farmer(Base):
     __tablename__ = "farmers"
+    # Serves location-filtered keyset pagination (WHERE location = ? AND farmer_id > ? ORDER BY farmer_id)
+    __table_args__ = (Index("ix_farmers_location_farmer_id", "location", "farmer_id"),)
 
     farmer_id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
@@ -26,16 +28,55 @@ class User(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Serves per-user history, newest first (WHERE user_id = ? ORDER BY created_at DESC, id DESC)
+        Index("ix_messages_user_created", "user_id", "created_at", "id"),
+        # Idempotent /chat/batch uploads: one message per client key per user (NULLs don't collide)
+        UniqueConstraint("user_id", "client_key", name="uq_messages_user_client_key"),
+    )
+
     id: Mapped[str] = mapped_column(String, primary_key=True, default=uuid_str)
     user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"), index=True)
     query: Mapped[str] = mapped_column(Text)
     reply: Mapped[str] = mapped_column(Text)
     intent: Mapped[str] = mapped_column(String, default="general")
+    # Set by offline clients syncing through /chat/batch
+    client_key: Mapped[str | None] = mapped_column(String, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     # audit
     record_hash: Mapped[str] = mapped_column(String, index=True)
+    # Canonical encoding record_hash was computed with (see hashing.py)
+    hash_version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
     fabric_tx_id: Mapped[str | None] = mapped_column(String, nullable=True)
     polygon_tx_hash: Mapped[str | None] = mapped_column(String, nullable=True)
 
+    # Merkle anchoring: batch whose root is on Polygon, and this message's inclusion proof
+    anchor_batch_id: Mapped[str | None] = mapped_column(String, ForeignKey("anchor_batches.id"), nullable=True, index=True)
+    merkle_proof: Mapped[str | None] = mapped_column(Text, nullable=True)
+
     user: Mapped["User"] = relationship(backref="messages")
+
+class AnchorBatch(Base):
+    __tablename__ = "anchor_batches"
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=uuid_str)
+    merkle_root: Mapped[str] = mapped_column(String, index=True)
+    size: Mapped[int] = mapped_column(Integer)
+    polygon_tx_hash: Mapped[str | None] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class OutboxEvent(Base):
+    """Pending ledger write for a message, committed in the same transaction as the message."""
+    __tablename__ = "ledger_outbox"
+    # Idempotency: one event per message per ledger
+    __table_args__ = (UniqueConstraint("message_id", "target", name="uq_outbox_message_target"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    message_id: Mapped[str] = mapped_column(String, ForeignKey("messages.id"))
+    target: Mapped[str] = mapped_column(String)  # fabric | polygon
+    status: Mapped[str] = mapped_column(String, default="pending")  # pending | in_flight | done | failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    # Earliest retry time; while in_flight, the lease expiry
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
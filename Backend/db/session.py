@@ -1,6 +1,12 @@
 from typing import AsyncGenerator
+import threading
+import time
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 import os
 from dotenv import load_dotenv
@@ -9,8 +15,118 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Pool and logging settings (shared by the async app engine and the sync engine in database.py)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+# WARNING = quiet; INFO logs every statement (the old echo=True); DEBUG adds result rows
+DB_LOG_LEVEL = os.getenv("DB_LOG_LEVEL", "WARNING").upper()
+
+
+# ------------------------------
+# 📊 Pool metrics
+# ------------------------------
+class PoolMetrics:
+    """Checkout wait times and current waiters, recorded by the metered pool classes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiters = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def begin_wait(self):
+        with self._lock:
+            self.waiters += 1
+
+    def end_wait(self, seconds: float, timed_out: bool):
+        with self._lock:
+            self.waiters -= 1
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+pool_metrics = PoolMetrics()
+
+
+def _metered(pool_cls):
+    class MeteredPool(pool_cls):
+        def _do_get(self):
+            pool_metrics.begin_wait()
+            start = time.perf_counter()
+            timed_out = False
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                # Only QueuePool's "timed out waiting for a connection"; connect
+                # or auth failures propagate without counting as pool timeouts
+                timed_out = True
+                raise
+            finally:
+                pool_metrics.end_wait(time.perf_counter() - start, timed_out)
+
+    MeteredPool.__name__ = f"Metered{pool_cls.__name__}"
+    return MeteredPool
+
+
+MeteredAsyncPool = _metered(AsyncAdaptedQueuePool)
+MeteredQueuePool = _metered(QueuePool)
+
+
+# ------------------------------
+# 🏭 Engine factory
+# ------------------------------
+def engine_options(url: str, is_async: bool) -> dict:
+    backend = make_url(url).get_backend_name()
+    options = {
+        "echo": {"INFO": True, "DEBUG": "debug"}.get(DB_LOG_LEVEL, False),
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if backend == "sqlite" and ":memory:" in url:
+        return options  # single shared connection, nothing to size
+
+    options.update(
+        poolclass=MeteredAsyncPool if is_async else MeteredQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    if backend == "postgresql" and DB_STATEMENT_TIMEOUT_MS > 0:
+        if is_async:  # asyncpg
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:  # psycopg2
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+def make_engine(url: str = DATABASE_URL):
+    """The app's async engine."""
+    return create_async_engine(url, **engine_options(url, is_async=True))
+
+
+def make_sync_engine(url: str = DATABASE_URL):
+    """Sync engine on the same database, e.g. for scripts (asyncpg -> psycopg2 driver)."""
+    sync_url = make_url(url)
+    if sync_url.drivername == "postgresql+asyncpg":
+        sync_url = sync_url.set(drivername="postgresql+psycopg2")
+    elif sync_url.drivername == "sqlite+aiosqlite":
+        sync_url = sync_url.set(drivername="sqlite")
+    sync_url = sync_url.render_as_string(hide_password=False)
+    return create_engine(sync_url, **engine_options(sync_url, is_async=False))
+
+
 # Create async engine
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = make_engine()
 
 # Session maker
 AsyncSessionLocal = sessionmaker(
@@ -21,3 +137,37 @@ AsyncSessionLocal = sessionmaker(
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def dialect_insert(session: AsyncSession):
+    """`insert` construct with ON CONFLICT support for the session's database."""
+    dialect = session.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"no ON CONFLICT support for {dialect}")
+    return insert
+
+
+def pool_status() -> dict:
+    pool = engine.sync_engine.pool
+    status = {
+        "pool": type(pool).__name__,
+        "waiters": pool_metrics.waiters,
+        "checkouts": pool_metrics.checkouts,
+        "timeouts": pool_metrics.timeouts,
+        "wait_seconds_total": round(pool_metrics.wait_seconds_total, 6),
+        "wait_seconds_max": round(pool_metrics.wait_seconds_max, 6),
+        "wait_seconds_avg": round(pool_metrics.wait_seconds_total / pool_metrics.checkouts, 6)
+        if pool_metrics.checkouts else 0.0,
+    }
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+    return status
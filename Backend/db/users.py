@@ -0,0 +1,79 @@
+import os
+import threading
+from collections import OrderedDict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import User, uuid_str
+from db.session import dialect_insert
+
+USER_ID_CACHE_SIZE = int(os.getenv("USER_ID_CACHE_SIZE", "100000"))
+
+
+class UserIdCache:
+    """Bounded LRU of external_id -> users.id, so repeat chatters skip the user lookup."""
+
+    def __init__(self, max_entries: int = USER_ID_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._ids: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, external_id: str) -> str | None:
+        with self._lock:
+            user_id = self._ids.get(external_id)
+            if user_id is not None:
+                self._ids.move_to_end(external_id)
+            return user_id
+
+    def put(self, external_id: str, user_id: str):
+        """Only call after the transaction that created the user has committed."""
+        with self._lock:
+            self._ids[external_id] = user_id
+            self._ids.move_to_end(external_id)
+            while len(self._ids) > self.max_entries:
+                self._ids.popitem(last=False)
+
+    def discard(self, external_id: str):
+        with self._lock:
+            self._ids.pop(external_id, None)
+
+
+user_ids = UserIdCache()
+
+
+async def upsert_user_id(session: AsyncSession, external_id: str) -> str:
+    """
+    One round-trip: insert the user if missing and return its id either way.
+    The no-op DO UPDATE makes RETURNING yield the existing row on conflict.
+    """
+    insert = dialect_insert(session)
+    stmt = insert(User).values(id=uuid_str(), external_id=external_id)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.external_id],
+        set_={"external_id": stmt.excluded.external_id},
+    ).returning(User.id)
+    return (await session.execute(stmt)).scalar_one()
+
+
+async def resolve_user_id(session: AsyncSession, external_id: str) -> str:
+    return user_ids.get(external_id) or await upsert_user_id(session, external_id)
+
+
+async def resolve_user_ids(session: AsyncSession, external_ids) -> dict:
+    """external_id -> users.id for many users: cache first, then one multi-row upsert for the rest."""
+    resolved, missing = {}, []
+    for external_id in dict.fromkeys(external_ids):
+        user_id = user_ids.get(external_id)
+        if user_id is not None:
+            resolved[external_id] = user_id
+        else:
+            missing.append(external_id)
+    if missing:
+        insert = dialect_insert(session)
+        stmt = insert(User).values([{"id": uuid_str(), "external_id": e} for e in missing])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.external_id],
+            set_={"external_id": stmt.excluded.external_id},
+        ).returning(User.external_id, User.id)
+        resolved.update((await session.execute(stmt)).tuples().all())
+    return resolved
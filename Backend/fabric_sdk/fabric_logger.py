@@ -13,4 +13,4 @@ def log_to_fabric(user_id: str, message_id: str, record_hash: str) -> str:
     # result, tx_id = contract.submit_transaction("LogMessageHash", payload)
     # return tx_id
     # Stub for now:
-    return "FABRIC_TX_ID_STUB"    what to do with this code 
+    return "FABRIC_TX_ID_STUB"
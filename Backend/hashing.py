@@ -1,22 +1,68 @@
+"""
+Canonical record encoding and hashing for chat messages.
+
+This is the single source of truth used by /chat, /audit, the bulk verifier
+and the ledger paths. Every Message stores the `hash_version` its
+record_hash was computed with, so the encoding can evolve without making
+old rows look tampered.
+
+Version 1 is the byte layout all existing hashes were produced with:
+
+    json.dumps({"user_id": u, "query": q, "reply": r},
+               ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+i.e. `{"query":...,"reply":...,"user_id":...}` encoded as UTF-8. Because the
+record always has the same three keys, the fast path writes that layout
+directly with the same string escaper json.dumps uses, skipping dict
+construction and key sorting.
+"""
 import hashlib
 import json
+from json.encoder import encode_basestring
+from typing import Iterable, List, Tuple
+
+HASH_VERSION = 1
+
+_V1_LAYOUT = '{"query":%s,"reply":%s,"user_id":%s}'
+
+
+def _canonical_v1_generic(user_id, query, reply) -> bytes:
+    """Reference encoder; also handles non-string values the fast path refuses."""
+    return json.dumps(
+        {"user_id": user_id, "query": query, "reply": reply},
+        ensure_ascii=False, separators=(",", ":"), sort_keys=True
+    ).encode("utf-8")
+
+
+def canonical_record(user_id: str, query: str, reply: str, version: int = HASH_VERSION) -> bytes:
+    """Canonical byte representation of a chat record for the given hash version."""
+    if version != 1:
+        raise ValueError(f"unknown hash version: {version}")
+    if type(user_id) is not str or type(query) is not str or type(reply) is not str:
+        return _canonical_v1_generic(user_id, query, reply)
+    return (_V1_LAYOUT % (encode_basestring(query), encode_basestring(reply), encode_basestring(user_id))).encode("utf-8")
+
+
+def sha256_hex(data: bytes) -> str:
+    """SHA-256 hex digest of the given bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def record_hash(user_id: str, query: str, reply: str, version: int = HASH_VERSION) -> str:
+    return hashlib.sha256(canonical_record(user_id, query, reply, version)).hexdigest()
+
 
-def sha256_hex(data: str) -> str:
-    """
-    Return SHA-256 hex digest of a string.
-    """
-    return hashlib.sha256(data.encode("utf-8")).hexdigest()
-
-
-def canonical_record(user_id: str, query: str, reply: str) -> str:
-    """
-    Create a canonical JSON string for hashing.
-    This ensures consistent formatting across DB, Fabric, and Polygon.
-    """
-    record = {
-        "user_id": user_id,
-        "query": query,
-        "reply": reply
-    }
-    # sort_keys=True ensures deterministic JSON structure
-    return json.dumps(record, sort_keys=True)
+def hash_many(records: Iterable[Tuple[str, str, str]], version: int = HASH_VERSION) -> List[str]:
+    """record_hash over many (user_id, query, reply) tuples, with lookups hoisted out of the loop."""
+    if version != 1:
+        raise ValueError(f"unknown hash version: {version}")
+    sha256, enc, layout, generic = hashlib.sha256, encode_basestring, _V1_LAYOUT, _canonical_v1_generic
+    hashes = []
+    append = hashes.append
+    for user_id, query, reply in records:
+        if type(user_id) is str and type(query) is str and type(reply) is str:
+            data = (layout % (enc(query), enc(reply), enc(user_id))).encode("utf-8")
+        else:
+            data = generic(user_id, query, reply)
+        append(sha256(data).hexdigest())
+    return hashes
@@ -0,0 +1,293 @@
+"""
+Offline ingestion: build or update the vector index used by retrieve_context.
+
+Documents (.txt/.md, .csv crop advisories, .pdf) are streamed through
+chunking, deduplicated by content hash and embedded in large batches with the
+MiniLM model. Embeddings are cached on disk keyed by chunk hash, so re-running
+on an updated corpus only embeds chunks that changed; the index itself is
+updated incrementally (new chunks added, vanished ones deleted).
+
+    cd Backend
+    python -m ingest_corpus data/corpus
+    python -m ingest_corpus data/corpus extra/advisories.csv --index-type hnsw --rebuild
+"""
+import argparse
+import csv
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import time
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from chatbot.index_manager import IndexManager, VECTOR_INDEX_PATH, VECTOR_INDEX_TYPE
+from chatbot.retriever import EMBEDDING_MODEL
+
+INGEST_CHUNK_CHARS = int(os.getenv("INGEST_CHUNK_CHARS", "800"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "100"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "512"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite")
+
+TEXT_SUFFIXES = (".txt", ".md")
+
+
+# ------------------------------
+# 📄 Readers: path -> (text, metadata) documents
+# ------------------------------
+def read_text(path: str) -> Iterator[Tuple[str, dict]]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        yield f.read(), {"source": path}
+
+
+def read_csv(path: str) -> Iterator[Tuple[str, dict]]:
+    """One document per row, as "column: value" lines so the headers are searchable too."""
+    with open(path, encoding="utf-8", errors="replace", newline="") as f:
+        for row_number, row in enumerate(csv.DictReader(f), start=2):
+            text = "\n".join(f"{k}: {v}" for k, v in row.items() if k and v and v.strip())
+            if text:
+                yield text, {"source": path, "row": row_number}
+
+
+def read_pdf(path: str) -> Iterator[Tuple[str, dict]]:
+    from pypdf import PdfReader
+
+    for page_number, page in enumerate(PdfReader(path).pages, start=1):
+        text = page.extract_text() or ""
+        if text.strip():
+            yield text, {"source": path, "page": page_number}
+
+
+def iter_files(paths: Iterable[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def iter_documents(paths: Iterable[str]) -> Iterator[Tuple[str, dict]]:
+    for path in iter_files(paths):
+        suffix = os.path.splitext(path)[1].lower()
+        if suffix in TEXT_SUFFIXES:
+            yield from read_text(path)
+        elif suffix == ".csv":
+            yield from read_csv(path)
+        elif suffix == ".pdf":
+            yield from read_pdf(path)
+
+
+# ------------------------------
+# ✂️ Chunking and dedupe
+# ------------------------------
+_WHITESPACE = re.compile(r"\s+")
+_BREAKS = ("\n\n", "\n", ". ", "। ", " ")
+
+
+def chunk_text(text: str, size: int = INGEST_CHUNK_CHARS, overlap: int = INGEST_CHUNK_OVERLAP) -> List[str]:
+    """Split into ~size-character chunks, preferring paragraph, line, then sentence breaks."""
+    text = text.strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            for sep in _BREAKS:
+                cut = text.rfind(sep, start + size // 2, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def chunk_hash(text: str) -> str:
+    """Content key: whitespace differences don't make a new chunk."""
+    return hashlib.sha256(_WHITESPACE.sub(" ", text).strip().encode("utf-8")).hexdigest()
+
+
+def iter_chunks(paths: Iterable[str], stats: dict) -> Iterator[Tuple[str, str, dict]]:
+    """(hash, text, metadata) for every unique chunk in the corpus."""
+    seen = set()
+    for text, metadata in iter_documents(paths):
+        stats["documents"] += 1
+        for chunk in chunk_text(text):
+            key = chunk_hash(chunk)
+            if key in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(key)
+            yield key, chunk, metadata
+
+
+# ------------------------------
+# 💾 Embedding cache
+# ------------------------------
+class EmbeddingCache:
+    """sqlite table of float32 vectors keyed by (model, chunk hash)."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, model: str = EMBEDDING_MODEL):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.model = model
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, chunk_hash TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, chunk_hash))"
+        )
+
+    def get_many(self, keys: List[str]) -> dict:
+        found = {}
+        # Stay under sqlite's bound-parameter limit
+        for i in range(0, len(keys), 900):
+            part = keys[i:i + 900]
+            rows = self.db.execute(
+                f"SELECT chunk_hash, vector FROM embeddings WHERE model = ? AND chunk_hash IN ({','.join('?' * len(part))})",
+                [self.model, *part],
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: List[Tuple[str, np.ndarray]]):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, chunk_hash, vector) VALUES (?, ?, ?)",
+            [(self.model, key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items],
+        )
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+# ------------------------------
+# 🧮 Embedding
+# ------------------------------
+def make_embedder(workers: int = INGEST_WORKERS) -> Tuple[Callable[[List[str]], np.ndarray], Callable[[], None]]:
+    """(embed_fn, close). One process uses every core through torch threads; workers > 1 uses a process pool."""
+    from sentence_transformers import SentenceTransformer
+    import torch
+
+    model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    if workers > 1:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+        pool = model.start_multi_process_pool(["cpu"] * workers)
+
+        def embed(texts):
+            return model.encode_multi_process(texts, pool, batch_size=64)
+
+        return embed, lambda: model.stop_multi_process_pool(pool)
+
+    torch.set_num_threads(os.cpu_count() or 1)
+
+    def embed(texts):
+        return model.encode(texts, batch_size=64, convert_to_numpy=True, show_progress_bar=False)
+
+    return embed, lambda: None
+
+
+def _batches(items: Iterator, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest(
+    paths: Iterable[str],
+    manager: IndexManager,
+    embed_fn: Callable[[List[str]], np.ndarray],
+    cache: EmbeddingCache,
+    batch_size: int = INGEST_BATCH_SIZE,
+    prune: bool = True,
+    rebuild: bool = False,
+) -> dict:
+    """Embed (or reuse) every unique chunk and sync the index to the corpus."""
+    stats = dict(documents=0, chunks=0, duplicates=0, cache_hits=0, embedded=0, added=0, removed=0)
+    start = time.perf_counter()
+
+    snapshot = manager.load()
+    indexed = set() if rebuild or snapshot is None else {doc["key"] for doc in snapshot.docs.values()}
+    corpus_keys = set()
+    keys, texts, metadatas, vectors = [], [], [], []
+
+    for batch in _batches(iter_chunks(paths, stats), batch_size):
+        stats["chunks"] += len(batch)
+        corpus_keys.update(key for key, _, _ in batch)
+        # Chunks already in the index need neither an embedding nor a write
+        batch = [item for item in batch if item[0] not in indexed]
+        if not batch:
+            continue
+
+        cached = cache.get_many([key for key, _, _ in batch])
+        missing = [(key, text) for key, text, _ in batch if key not in cached]
+        stats["cache_hits"] += len(batch) - len(missing)
+        if missing:
+            embedded = np.asarray(embed_fn([text for _, text in missing]), dtype=np.float32)
+            cache.put_many([(key, vector) for (key, _), vector in zip(missing, embedded)])
+            cached.update((key, vector) for (key, _), vector in zip(missing, embedded))
+            stats["embedded"] += len(missing)
+
+        for key, text, metadata in batch:
+            keys.append(key)
+            texts.append(text)
+            metadatas.append(metadata)
+            vectors.append(cached[key])
+
+    # One snapshot per run, however many batches were embedded
+    if rebuild:
+        if keys:
+            manager.rebuild(texts, np.vstack(vectors), metadatas, keys)
+        stats["added"] = len(keys)
+    else:
+        stale = indexed - corpus_keys if prune else set()
+        if keys:
+            manager.add_documents(texts, np.vstack(vectors), metadatas, keys)
+            stats["added"] = len(keys)
+        if stale:
+            stats["removed"] = manager.delete(stale)
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="files or directories (.txt, .md, .csv, .pdf)")
+    parser.add_argument("--index-path", default=VECTOR_INDEX_PATH)
+    parser.add_argument("--index-type", default=VECTOR_INDEX_TYPE, choices=("flat", "ivf", "hnsw"))
+    parser.add_argument("--cache", default=EMBEDDING_CACHE_PATH, help="embedding cache sqlite file")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="embedding processes (1 = all cores in one process)")
+    parser.add_argument("--rebuild", action="store_true", help="replace the index instead of updating it")
+    parser.add_argument("--keep-stale", action="store_true", help="don't delete chunks that are no longer in the corpus")
+    args = parser.parse_args()
+
+    manager = IndexManager(args.index_path, index_type=args.index_type)
+    cache = EmbeddingCache(args.cache)
+    embed_fn, close = make_embedder(args.workers)
+    try:
+        stats = ingest(args.paths, manager, embed_fn, cache, args.batch_size,
+                       prune=not args.keep_stale, rebuild=args.rebuild)
+    finally:
+        close()
+        cache.close()
+    print(f"✅ Ingested: {stats}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
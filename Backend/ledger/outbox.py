@@ -0,0 +1,209 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Message, OutboxEvent, User
+from metrics import stage
+
+# ===============================================================
+# 📮 Ledger outbox
+# /chat writes an OutboxEvent row in the same transaction as the
+# Message; this worker drains the table in the background, so chat
+# latency never depends on Fabric or Polygon being reachable.
+# Polygon is not written per message: its events are completed by
+# chain.anchoring, one Merkle-root transaction per batch.
+# ===============================================================
+
+OUTBOX_TARGETS = [t.strip() for t in os.getenv("OUTBOX_TARGETS", "").split(",") if t.strip()]
+# Targets delivered by the anchoring service instead of this worker
+ANCHORED_TARGETS = ("polygon",)
+LEDGER_TARGETS = [t for t in OUTBOX_TARGETS if t not in ANCHORED_TARGETS]
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "4"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "2"))
+OUTBOX_MAX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "600"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+
+
+# ------------------------------
+# 🔌 Ledger handlers
+# Each returns the ledger tx id. The ledger side receives message_id
+# so a replayed event can be recognised there as well.
+# ------------------------------
+def _log_fabric(user_id: str, message_id: str, record_hash: str) -> str:
+    from fabric_sdk.fabric_logger import log_to_fabric
+    return log_to_fabric(user_id=user_id, message_id=message_id, record_hash=record_hash)
+
+# target -> (handler, Message column the tx id is written to)
+HANDLERS = {
+    "fabric": (_log_fabric, "fabric_tx_id"),
+}
+
+
+def enqueue_ledger_events(session: AsyncSession, message_id: str, targets=None):
+    """Add one outbox row per ledger target; commits with the caller's transaction."""
+    for target in targets if targets is not None else LEDGER_TARGETS:
+        session.add(OutboxEvent(message_id=message_id, target=target))
+
+
+async def enqueue_ledger_events_many(session: AsyncSession, message_ids, targets=None):
+    """Outbox rows for many messages in one multi-row INSERT; commits with the caller's transaction."""
+    targets = targets if targets is not None else LEDGER_TARGETS
+    rows = [{"message_id": m, "target": t} for m in message_ids for t in targets]
+    if rows:
+        await session.execute(insert(OutboxEvent).values(rows))
+
+
+class OutboxWorker:
+    def __init__(
+        self,
+        session_factory,
+        concurrency: int = OUTBOX_CONCURRENCY,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_seconds: float = OUTBOX_POLL_SECONDS,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self._limit = asyncio.Semaphore(max(1, concurrency))
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+
+    # ------------------------------
+    # 🔄 Lifecycle
+    # ------------------------------
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def notify(self):
+        """Wake the worker right after a commit instead of waiting for the next poll."""
+        self._wake.set()
+
+    async def run(self):
+        while True:
+            try:
+                claimed = await self.drain_once()
+            except Exception as e:
+                print("⚠️ Outbox drain failed:", e)
+                claimed = 0
+            if claimed < self.batch_size:
+                try:
+                    self._wake.clear()
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+    # ------------------------------
+    # 📤 Draining
+    # ------------------------------
+    async def drain_once(self) -> int:
+        events = await self._claim()
+        await asyncio.gather(*(self._deliver(*event) for event in events))
+        return len(events)
+
+    async def _claim(self) -> list:
+        """
+        Lease due pending events to this worker. An in_flight event whose
+        lease expired (its handler hung or the worker died) counts as a
+        failed attempt: it is backed off like any other failure, or given
+        up on after max_attempts.
+        """
+        now = datetime.utcnow()
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(OutboxEvent.id, OutboxEvent.target, OutboxEvent.attempts,
+                       Message.id, Message.record_hash, User.external_id, OutboxEvent.status)
+                .join(Message, Message.id == OutboxEvent.message_id)
+                .join(User, User.id == Message.user_id)
+                .where(OutboxEvent.status.in_(("pending", "in_flight")), OutboxEvent.next_attempt_at <= now,
+                       OutboxEvent.target.in_(HANDLERS))
+                .order_by(OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(of=OutboxEvent, skip_locked=True)
+            )
+            rows = []
+            for *event, status in result.all():
+                if status == "in_flight":
+                    event_id, attempts = event[0], event[2]
+                    await session.execute(
+                        update(OutboxEvent).where(OutboxEvent.id == event_id)
+                        .values(**self._failure(event_id, attempts + 1, "lease expired"))
+                    )
+                else:
+                    rows.append(tuple(event))
+            if rows:
+                await session.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id.in_([r[0] for r in rows]))
+                    .values(status="in_flight", next_attempt_at=now + timedelta(seconds=OUTBOX_LEASE_SECONDS))
+                )
+            await session.commit()
+            return rows
+
+    async def _deliver(self, event_id, target, attempts, message_id, record_hash, external_id):
+        handler, column = HANDLERS[target]
+        async with self._limit:
+            async with self.session_factory() as session:
+                # Idempotency: a message that already has its tx id is never re-sent
+                tx_id = (await session.execute(
+                    select(getattr(Message, column)).where(Message.id == message_id)
+                )).scalar_one()
+                if tx_id is None:
+                    try:
+                        with stage("ledger"):
+                            tx_id = await asyncio.get_running_loop().run_in_executor(
+                                None, handler, external_id, message_id, record_hash
+                            )
+                    except Exception as e:
+                        await self._reschedule(session, event_id, attempts + 1, str(e))
+                        return
+
+                await session.execute(update(Message).where(Message.id == message_id).values({column: tx_id}))
+                await session.execute(
+                    update(OutboxEvent).where(OutboxEvent.id == event_id)
+                    .values(status="done", attempts=attempts + 1, last_error=None)
+                )
+                await session.commit()
+                self.delivered += 1
+
+    async def _reschedule(self, session: AsyncSession, event_id: int, attempts: int, error: str):
+        await session.execute(
+            update(OutboxEvent).where(OutboxEvent.id == event_id).values(**self._failure(event_id, attempts, error))
+        )
+        await session.commit()
+
+    def _failure(self, event_id: int, attempts: int, error: str) -> dict:
+        """Column values for a failed attempt: retry later with backoff, or give up."""
+        if attempts >= self.max_attempts:
+            self.failed += 1
+            print(f"❌ Outbox event {event_id} gave up after {attempts} attempts:", error)
+            return dict(status="failed", attempts=attempts, last_error=error)
+        # Exponential backoff with jitter so a ledger outage doesn't cause retry waves
+        delay = min(OUTBOX_MAX_BACKOFF_SECONDS, OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1))
+        delay *= random.uniform(0.5, 1.0)
+        self.retried += 1
+        return dict(
+            status="pending", attempts=attempts, last_error=error,
+            next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+        )
+
+    def stats(self) -> dict:
+        return {"delivered": self.delivered, "retried": self.retried, "failed": self.failed}
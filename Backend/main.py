@@ -1,33 +1,151 @@
 # main.py
 
-import os, json, hashlib
-from fastapi import FastAPI, HTTPException, Depends
+import os, json, asyncio, time
+from datetime import datetime, timedelta
+from collections import Counter
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 # Local imports
 from routes import audit, farmers
-from chatbot.agent import get_bot_reply
+from chatbot.agent import generate_batch, stream_text
+from chatbot.scheduler import InferenceScheduler
+from chatbot.model_registry import registry
+from chatbot.response_cache import normalize_query, reply_cache
+from chatbot.retriever import context_version, retrieval_stats
+from chatbot.singleflight import SingleFlight
+from chatbot.admission import Rejected, admission
+from chatbot.memory import history_digest, memory, with_history
+from chatbot.safety_filters import clean_input, output_filter, safety_filter, scrub_output
 from chatbot.utils import heuristic_enrich  # If exists
-from db.session import get_session, engine
+from chatbot.enrichment import enrichment
+from chatbot.intent import DEFAULT_INTENT, intent_router
+from hashing import HASH_VERSION, hash_many, record_hash
+from metrics import HTTP_SECONDS, counter, gauge, histogram, render_metrics, stage, trace
+from db.session import get_session, engine, AsyncSessionLocal, pool_status
 from db import models
-from db.models import User, Message
-# from fabric_sdk.fabric_client import log_to_fabric
-# from chain.polygon_client import publish_hash_on_polygon
+from db.models import Message, uuid_str
+from db.users import resolve_user_id, resolve_user_ids, user_ids
+from db.messages import find_by_client_keys, insert_messages
+from db.history import history_page, recent_turns
+from chain.anchoring import AnchorService, ANCHOR_ENABLED, make_rpc
+from ledger.outbox import (
+    ANCHORED_TARGETS, LEDGER_TARGETS, OUTBOX_TARGETS, OutboxWorker, enqueue_ledger_events, enqueue_ledger_events_many,
+)
 
 # ---------------------------------------------------------------------
 # 🌱 Load environment variables
 # ---------------------------------------------------------------------
 load_dotenv()
 
+MAX_HISTORY_PAGE = 200
+MAX_CHAT_BATCH = int(os.getenv("MAX_CHAT_BATCH", "100"))
+
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "false").lower() == "true"
+
+
+def models_to_warm(setting: str | None) -> list[str]:
+    """
+    Registry names loaded before serving. WARMUP_MODELS=all loads every
+    registered model, none loads nothing, otherwise a comma-separated list.
+    Unset: only what this app's chat path uses. The built-in agent needs no
+    model; the semantic reply cache needs the embeddings.
+    """
+    if setting is None:
+        return ["embeddings"] if reply_cache.semantic else []
+    setting = setting.strip().lower()
+    if setting in ("all", "true"):
+        return [name for name in registry.status()]
+    if setting in ("", "none", "false"):
+        return []
+    return [name.strip() for name in setting.split(",") if name.strip()]
+
+
+WARMUP_MODELS = models_to_warm(os.getenv("WARMUP_MODELS"))
+
+# With `gunicorn --preload -k uvicorn.workers.UvicornWorker`, loading here
+# happens once in the master; forked workers share the weights copy-on-write.
+if PRELOAD_MODELS and WARMUP_MODELS:
+    registry.warm_up(WARMUP_MODELS)
+
 # ---------------------------------------------------------------------
 # 🚀 Initialize FastAPI app
 # ---------------------------------------------------------------------
 app = FastAPI(title="AgroAI Backend 🌾", version="1.0")
 
+# Generation runs on the scheduler's thread pool, never on the event loop
+chat_scheduler = InferenceScheduler(generate_batch, stream_text)
+
+# Identical prompts in flight at the same time share one generation
+inflight = SingleFlight()
+
+# Message hashes are anchored on Polygon in Merkle batches, off the request path.
+# OUTBOX_TARGETS=polygon is delivered this way too (never one transaction per message).
+anchor_service = (
+    AnchorService(make_rpc(), AsyncSessionLocal)
+    if ANCHOR_ENABLED or any(t in ANCHORED_TARGETS for t in OUTBOX_TARGETS) else None
+)
+
+# Fabric writes are drained from the outbox table in the background
+outbox_worker = OutboxWorker(AsyncSessionLocal) if LEDGER_TARGETS else None
+
+# ---------------------------------------------------------------------
+# 📈 Metrics (GET /metrics)
+# Most values already live in the components' stats(); they're read
+# at scrape time instead of being pushed from the request path.
+# ---------------------------------------------------------------------
+FIRST_TOKEN_SECONDS = histogram(
+    "agroai_stream_first_token_seconds", "Time from /chat/stream request to the first token event"
+)
+gauge("agroai_inference_queue_depth", "Prompts waiting for the inference scheduler",
+      fn=lambda: chat_scheduler.queue_depth)
+counter("agroai_inference_batches_total", "Micro-batches run by the inference scheduler",
+        fn=lambda: chat_scheduler.batches)
+counter("agroai_inference_prompts_total", "Prompts generated by the inference scheduler",
+        fn=lambda: chat_scheduler.prompts)
+counter("agroai_model_errors_total", "Model calls (batch or stream) that raised",
+        fn=lambda: chat_scheduler.errors)
+counter("agroai_reply_cache_lookups_total", "Reply cache lookups by result", ["result"], fn=lambda: {
+    (result,): reply_cache.stats()[key]
+    for result, key in (("exact_hit", "exact_hits"), ("semantic_hit", "semantic_hits"),
+                        ("miss", "misses"), ("bypass", "bypassed"))
+})
+gauge("agroai_db_pool_connections", "Database pool connections by state", ["state"], fn=lambda: {
+    (state,): value for state, value in pool_status().items()
+    if state in ("size", "checked_out", "checked_in", "overflow", "waiters")
+})
+counter("agroai_db_pool_timeouts_total", "Pool checkouts that timed out", fn=lambda: pool_status()["timeouts"])
+gauge("agroai_memory_users", "Users with conversation memory in this worker", fn=lambda: memory.stats()["users"])
+counter("agroai_redactions_total", "PII / blocklist redactions by label", ["label"], fn=lambda: {
+    (label,): count for label, count in (
+        Counter(safety_filter.stats()["redactions"]) + Counter(output_filter.stats()["redactions"])
+    ).items()
+})
+counter("agroai_singleflight_requests_total", "Generations requested, by whether they started one or joined one",
+        ["role"], fn=lambda: {("leader",): inflight.leaders, ("follower",): inflight.coalesced})
+counter("agroai_singleflight_timeouts_total", "Callers that stopped waiting for a shared generation",
+        fn=lambda: inflight.timeouts)
+counter("agroai_singleflight_cancelled_total", "Shared generations cancelled because every caller left",
+        fn=lambda: inflight.cancelled)
+gauge("agroai_singleflight_in_flight", "Distinct generations currently shared", fn=lambda: inflight.in_flight)
+gauge("agroai_admission_queue_depth", "Requests waiting for a generation slot", ["priority"],
+      fn=lambda: {(p,): n for p, n in admission.stats()["queue_depth"].items()})
+gauge("agroai_admission_in_flight", "Generation slots in use", fn=lambda: admission.stats()["in_flight"])
+counter("agroai_admission_rejected_total", "Requests refused by admission control", ["reason"],
+        fn=lambda: {(r,): n for r, n in admission.rejected.items()})
+counter("agroai_enrichment_tips_total", "Enrichment tips appended to replies",
+        fn=lambda: enrichment.stats()["tips_added"])
+counter("agroai_intents_total", "Queries by classified intent", ["intent"],
+        fn=lambda: {(i,): n for i, n in intent_router.counts.items()})
+counter("agroai_templated_replies_total", "Queries answered from a template without the model",
+        fn=lambda: intent_router.templated)
+counter("agroai_ledger_events_total", "Outbox ledger deliveries by result", ["result"],
+        fn=lambda: {(k,): v for k, v in outbox_worker.stats().items()} if outbox_worker else {})
+
 # CORS setup – allow frontend to connect to backend
 app.add_middleware(
     CORSMiddleware,
@@ -35,8 +153,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # keyset cursor for /farmers and /chat/history pages; Retry-After on 429/503
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
 
+@app.exception_handler(Rejected)
+async def rejected_handler(request: Request, exc: Rejected):
+    """Load shedding: 429 (user rate limit) or 503 (overloaded), both with Retry-After."""
+    return JSONResponse(
+        status_code=exc.status,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": exc.retry_after_header},
+    )
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Per-route latency. Streaming responses are timed until their headers are sent."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            # The route template, not the raw path, keeps label cardinality bounded
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        )
+
 # ---------------------------------------------------------------------
 # 🧱 Database Initialization
 # ---------------------------------------------------------------------
@@ -45,14 +193,31 @@ async def startup():
     async with engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
     print("✅ Database initialized successfully!")
+    if WARMUP_MODELS:
+        # Load off the event loop; the worker starts serving once models are ready
+        await asyncio.get_running_loop().run_in_executor(None, registry.warm_up, WARMUP_MODELS)
+    chat_scheduler.start()
+    if anchor_service:
+        anchor_service.start()
+    if outbox_worker:
+        outbox_worker.start()
     print("🤖 Chatbot model loaded and backend ready!")
 
+@app.on_event("shutdown")
+async def shutdown():
+    await chat_scheduler.stop()
+    if anchor_service:
+        await anchor_service.stop()
+    if outbox_worker:
+        await outbox_worker.stop()
+
 # ---------------------------------------------------------------------
 # 🧩 Pydantic Schemas
 # ---------------------------------------------------------------------
 class ChatRequest(BaseModel):
     user_id: str
     query: str
+    use_cache: bool = True  # set False to force a fresh generation
 
 class ChatResponse(BaseModel):
     answer: str
@@ -60,20 +225,142 @@ class ChatResponse(BaseModel):
     fabric_tx_id: str | None = None
     polygon_tx_hash: str | None = None
 
-# ---------------------------------------------------------------------
-# 🔐 Utility functions
-# ---------------------------------------------------------------------
-def canonical_record(user_id: str, query: str, reply: str) -> bytes:
-    """Create a canonical JSON record for blockchain hashing."""
-    payload = json.dumps(
-        {"user_id": user_id, "query": query, "reply": reply},
-        ensure_ascii=False, separators=(",", ":"), sort_keys=True
+class BatchChatItem(ChatRequest):
+    # The app's id for the queued message; uploading it again returns the stored reply
+    client_key: str = Field(..., min_length=1, max_length=128)
+
+class BatchChatRequest(BaseModel):
+    items: list[BatchChatItem] = Field(..., min_length=1, max_length=MAX_CHAT_BATCH)
+
+class BatchChatResult(BaseModel):
+    client_key: str
+    answer: str
+    message_id: str
+    record_hash: str
+    duplicate: bool = False  # stored by an earlier upload (or earlier in this batch), not generated again
+
+async def save_message(
+    session: AsyncSession, external_id: str, query: str, reply: str, intent: str = DEFAULT_INTENT
+) -> Message:
+    """
+    Stage the message with its record hash. The user id comes from the
+    in-process cache or a single upsert; the message itself is written
+    by one INSERT when the caller commits.
+    """
+    user_id = await resolve_user_id(session, external_id)
+
+    # ✅ Record hash only depends on the request, so it goes in with the INSERT
+    msg = Message(
+        id=uuid_str(),
+        user_id=user_id,
+        query=query,
+        reply=reply,
+        intent=intent,
+        hash_version=HASH_VERSION
     )
-    return payload.encode("utf-8")
+    with stage("hash"):
+        msg.record_hash = record_hash(external_id, query, reply)
+    session.add(msg)
+    return msg
+
+
+async def load_turns(external_id: str, limit: int) -> list:
+    """Conversation memory loader for requests without a session of their own."""
+    async with AsyncSessionLocal() as session:
+        return await recent_turns(session, external_id, limit)
+
+
+async def generate(query: str, history: str = "", cache: bool = False, priority: str = "interactive") -> str:
+    """
+    One generation; PII is scrubbed from what goes into and comes out of
+    the model. Concurrent calls with the same normalized query, history
+    digest and index snapshot share it; the caller that starts it takes
+    the admission slot and (with `cache`) stores the reply, so followers
+    do neither.
+    """
+    context = history_digest(history)
+
+    async def run() -> str:
+        with stage("sanitize"):
+            clean_prompt = clean_input(with_history(history, query))
+        async with admission.slot(priority):
+            with stage("generate"):
+                reply = await chat_scheduler.submit(clean_prompt)
+        with stage("scrub_output"):
+            reply = scrub_output(reply)
+        if cache:
+            reply_cache.put(query, reply, context=context)
+        return reply
+
+    return await inflight.do((context_version(), normalize_query(query), context), run)
+
+
+async def generate_reply(query: str, use_cache: bool = True, history: str = "", priority: str = "interactive") -> str:
+    """
+    Cached reply if we have one, otherwise a (possibly shared) generation
+    from the scheduler. Follow-ups are cached under their history digest.
+    """
+    if not use_cache:
+        reply_cache.record_bypass()
+        return await generate(query, history, priority=priority)
+
+    with stage("cache_lookup"):
+        reply = await reply_cache.aget(query, context=history_digest(history))
+    if reply is None:
+        reply = await generate(query, history, cache=True, priority=priority)
+    return reply
+
+
+async def generate_replies(queries: list[str], use_cache: list[bool], priority: str = "batch") -> list[str]:
+    """
+    Replies for many first-turn queries, in order: cache lookups, then one
+    admission slot and one scheduler submission (micro-batched) for the
+    distinct misses. Queries that normalize the same are generated once.
+    """
+    replies: list[str | None] = [None] * len(queries)
+    with stage("cache_lookup"):
+        for i, (query, cached) in enumerate(zip(queries, use_cache)):
+            if cached:
+                replies[i] = await reply_cache.aget(query)
+            else:
+                reply_cache.record_bypass()
+
+    misses: dict[str, list[int]] = {}
+    for i, reply in enumerate(replies):
+        if reply is None:
+            misses.setdefault(normalize_query(queries[i]), []).append(i)
+    if not misses:
+        return replies
 
-def sha256_hex(data: bytes) -> str:
-    """Generate SHA256 hash for blockchain record integrity."""
-    return hashlib.sha256(data).hexdigest()
+    firsts = [positions[0] for positions in misses.values()]
+    with stage("sanitize"):
+        prompts = [clean_input(queries[i]) for i in firsts]
+    async with admission.slot(priority):
+        with stage("generate"):
+            generated = await chat_scheduler.submit_many(prompts)
+    with stage("scrub_output"):
+        generated = [scrub_output(reply) for reply in generated]
+    for positions, reply in zip(misses.values(), generated):
+        for i in positions:
+            replies[i] = reply
+        if any(use_cache[i] for i in positions):
+            reply_cache.put(queries[positions[0]], reply)
+    return replies
+
+
+def after_message_commit(external_id: str, msg: Message):
+    """Post-commit bookkeeping: cache the user id and turn, wake the background workers."""
+    user_ids.put(external_id, msg.user_id)
+    memory.append(external_id, msg.query, msg.reply)
+    if anchor_service:
+        anchor_service.notify()
+    if outbox_worker:
+        outbox_worker.notify()
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
 # ---------------------------------------------------------------------
@@ -81,71 +368,292 @@ def sha256_hex(data: bytes) -> str:
 # ---------------------------------------------------------------------
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(req: ChatRequest, session: AsyncSession = Depends(get_session)):
+    admission.check_user(req.user_id)
     try:
-        # ✅ Check if user exists, else create new
-        result = await session.execute(select(User).where(User.external_id == req.user_id))
-        user = result.scalar_one_or_none()
-        if not user:
-            user = User(external_id=req.user_id)
-            session.add(user)
-            await session.flush()
-
-        # ✅ Generate chatbot response using your HuggingFace model
-        base_reply = get_bot_reply(req.query)
-        full_reply = heuristic_enrich(req.query, base_reply) if 'heuristic_enrich' in globals() else base_reply
-
-        # ✅ Save message to database
-        msg = Message(
-            user_id=user.id,
-            query=req.query,
-            reply=full_reply,
-            intent="advice",
-            record_hash=""
-        )
-        session.add(msg)
-        await session.flush()
-
-        # ✅ Generate record hash for blockchain logging
-        canon = canonical_record(req.user_id, req.query, full_reply)
-        record_hash = sha256_hex(canon)
-        msg.record_hash = record_hash
-        await session.flush()
+        with trace("chat"):
+            with stage("intent"):
+                route = intent_router.route(req.query)
+            if route.reply is not None:
+                # Greetings, help and season -> crop lookups: templated, no model call
+                full_reply = route.reply
+            else:
+                with stage("history"):
+                    history = await memory.context(req.user_id, req.query, lambda ext, n: recent_turns(session, ext, n))
+                # ✅ Generate chatbot response using your HuggingFace model
+                base_reply = await generate_reply(req.query, req.use_cache, history)
+                with stage("enrich"):
+                    full_reply = heuristic_enrich(req.query, base_reply) if 'heuristic_enrich' in globals() else base_reply
 
-        # ⚙️ Blockchain placeholders (for later integration)
-        fabric_tx_id = None
-        polygon_tx_hash = None
-
-        '''try:
-            fabric_tx_id = log_to_fabric(user_id=req.user_id, message_id=msg.id, record_hash=record_hash)
-            msg.fabric_tx_id = fabric_tx_id
-        except Exception as fe:
-            print("⚠️ Fabric log failed:", fe)
-
-        try:
-            polygon_tx_hash = publish_hash_on_polygon(message_id=msg.id, record_hash="0x" + record_hash)
-            msg.polygon_tx_hash = polygon_tx_hash
-        except Exception as pe:
-            print("⚠️ Polygon log failed:", pe)'''
-
-        await session.commit()
+            with stage("db_write"):
+                msg = await save_message(session, req.user_id, req.query, full_reply, route.intent)
+                # Ledger writes are committed with the message and delivered later;
+                # fabric_tx_id is filled in by the outbox worker, polygon_tx_hash by anchoring
+                enqueue_ledger_events(session, msg.id)
+                await session.commit()
+            after_message_commit(req.user_id, msg)
 
         return ChatResponse(
             answer=full_reply,
             message_id=str(msg.id),
-            fabric_tx_id=fabric_tx_id,
-            polygon_tx_hash=polygon_tx_hash
+            fabric_tx_id=msg.fabric_tx_id,
+            polygon_tx_hash=msg.polygon_tx_hash
         )
 
+    except Rejected:
+        await session.rollback()
+        raise
+    except asyncio.TimeoutError:
+        await session.rollback()
+        raise HTTPException(status_code=504, detail="Timed out waiting for the model")
+    except Exception as e:
+        await session.rollback()
+        # A cached user id may be stale (e.g. user row removed); re-resolve next time
+        user_ids.discard(req.user_id)
+        raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
+
+# ---------------------------------------------------------------------
+# 📦 Batch Sync – questions queued on the device while offline
+# ---------------------------------------------------------------------
+@app.post("/chat/batch", response_model=list[BatchChatResult])
+async def chat_batch_endpoint(req: BatchChatRequest, session: AsyncSession = Depends(get_session)):
+    """
+    Answers many queued questions at once and returns one result per item,
+    in order. Items are deduplicated by (user, client_key), so replaying a
+    batch after a dropped connection returns the stored replies instead of
+    generating and storing them again. New messages are written with one
+    multi-row INSERT in a single transaction.
+    """
+    items = req.items
+    # One rate-limit token per user per upload, not per queued question
+    for external_id in dict.fromkeys(item.user_id for item in items):
+        admission.check_user(external_id)
+    admission.check("batch")
+
+    try:
+        with trace("chat_batch", items=len(items)):
+            with stage("dedupe"):
+                users = await resolve_user_ids(session, [item.user_id for item in items])
+                keys = [(users[item.user_id], item.client_key) for item in items]
+                existing = await find_by_client_keys(session, keys)
+            # Position of the first occurrence of each key that still needs an answer
+            new: dict = {}
+            for position, key in enumerate(keys):
+                if key not in existing and key not in new:
+                    new[key] = position
+            fresh = [items[position] for position in new.values()]
+
+            with stage("intent"):
+                routes = [intent_router.route(item.query) for item in fresh]
+            # Templated items are answered as-is; only the rest go to the model
+            to_generate = [i for i, route in enumerate(routes) if route.reply is None]
+            replies = [route.reply for route in routes]
+            generated = await generate_replies([fresh[i].query for i in to_generate],
+                                               [fresh[i].use_cache for i in to_generate])
+            with stage("enrich"):
+                for i, reply in zip(to_generate, generated):
+                    replies[i] = heuristic_enrich(fresh[i].query, reply)
+            with stage("hash"):
+                hashes = hash_many([(item.user_id, item.query, reply) for item, reply in zip(fresh, replies)])
+
+            # Distinct timestamps keep the batch's order in /chat/history
+            now = datetime.utcnow()
+            rows = [
+                dict(id=uuid_str(), user_id=key[0], client_key=key[1], query=item.query, reply=reply,
+                     intent=route.intent, record_hash=digest, hash_version=HASH_VERSION,
+                     created_at=now + timedelta(microseconds=i))
+                for i, (key, item, route, reply, digest) in enumerate(zip(new, fresh, routes, replies, hashes))
+            ]
+            with stage("db_write"):
+                inserted = await insert_messages(session, rows)
+                stored = [row for row in rows if (row["user_id"], row["client_key"]) in inserted]
+                await enqueue_ledger_events_many(session, [row["id"] for row in stored])
+                # A concurrent replay stored some keys first: answer with its rows
+                raced = [key for key in new if key not in inserted]
+                if raced:
+                    existing.update(await find_by_client_keys(session, raced))
+                await session.commit()
+    except Rejected:
+        await session.rollback()
+        raise
+    except asyncio.TimeoutError:
+        await session.rollback()
+        raise HTTPException(status_code=504, detail="Timed out waiting for the model")
     except Exception as e:
         await session.rollback()
+        for item in items:
+            user_ids.discard(item.user_id)
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
+    external_ids = {users[item.user_id]: item.user_id for item in items}
+    for row in stored:
+        after_message_commit(external_ids[row["user_id"]], Message(**row))
+
+    by_key = {(row["user_id"], row["client_key"]): row for row in stored}
+    results = []
+    for position, (item, key) in enumerate(zip(items, keys)):
+        if key in existing:
+            msg = existing[key]
+            results.append(BatchChatResult(client_key=item.client_key, answer=msg.reply, message_id=msg.id,
+                                           record_hash=msg.record_hash, duplicate=True))
+        else:
+            row = by_key[key]
+            results.append(BatchChatResult(client_key=item.client_key, answer=row["reply"], message_id=row["id"],
+                                           record_hash=row["record_hash"], duplicate=new[key] != position))
+    return results
+
+# ---------------------------------------------------------------------
+# 📜 Chat History
+# ---------------------------------------------------------------------
+@app.get("/chat/history")
+async def chat_history(
+    response: Response,
+    user_id: str,
+    before: str | None = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    limit: int = Query(50, ge=1, le=MAX_HISTORY_PAGE),
+    session: AsyncSession = Depends(get_session),
+):
+    """One keyset page of the user's messages, newest first. Older pages follow X-Next-Cursor."""
+    try:
+        messages, next_cursor = await history_page(session, user_id, before, limit)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return messages
+
+# ---------------------------------------------------------------------
+# 📡 Streaming Chat Endpoint – Server-Sent Events
+# ---------------------------------------------------------------------
+@app.post("/chat/stream")
+async def chat_stream_endpoint(req: ChatRequest):
+    """
+    Streams the reply as `token` events while it is generated, then
+    stores the message and sends a final `done` event with its id and
+    record hash (or an `error` event if anything fails). Rate limits and
+    a saturated queue are refused with 429/503 before streaming starts;
+    templated answers need no generation slot, so they skip the latter.
+    """
+    admission.check_user(req.user_id)
+    with stage("intent"):
+        route = intent_router.route(req.query)
+    if route.reply is None:
+        admission.check("interactive")
+
+    async def events():
+        parts = []
+        started = time.perf_counter()
+        first_token = True
+
+        def token_event(text: str) -> str:
+            nonlocal first_token
+            if first_token:
+                FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started)
+                first_token = False
+            return sse_event("token", {"text": text})
+
+        with trace("chat_stream"):
+            try:
+                if route.reply is not None:
+                    # Templated answer: no history, cache or model needed
+                    full_reply = route.reply
+                    yield token_event(full_reply)
+                else:
+                    with stage("history"):
+                        history = await memory.context(req.user_id, req.query, load_turns)
+                    # Follow-ups are cached under a digest of the conversation they continue
+                    context = history_digest(history)
+                    with stage("cache_lookup"):
+                        cached = await reply_cache.aget(req.query, context=context) if req.use_cache else None
+                    if cached is not None:
+                        parts.append(cached)
+                        yield token_event(cached)
+                    else:
+                        if not req.use_cache:
+                            reply_cache.record_bypass()
+                        with stage("sanitize"):
+                            prompt = clean_input(with_history(history, req.query))
+                        # Output is scrubbed incrementally; only a trailing word / number is held back.
+                        # "generate" includes the time spent sending tokens to the client.
+                        scrubber = output_filter.stream()
+                        async with admission.slot("interactive"):
+                            with stage("generate"):
+                                async for token in chat_scheduler.stream(prompt):
+                                    text = scrubber.feed(token)
+                                    if text:
+                                        parts.append(text)
+                                        yield token_event(text)
+                                text = scrubber.flush()
+                                if text:
+                                    parts.append(text)
+                                    yield token_event(text)
+
+                    base_reply = "".join(parts)
+                    if cached is None and req.use_cache:
+                        reply_cache.put(req.query, base_reply, context=context)
+                    with stage("enrich"):
+                        full_reply = heuristic_enrich(req.query, base_reply)
+                    if len(full_reply) > len(base_reply):
+                        yield token_event(full_reply[len(base_reply):])
+
+                # The request-scoped session is gone once streaming starts,
+                # so persistence uses its own session
+                async with AsyncSessionLocal() as session:
+                    try:
+                        with stage("db_write"):
+                            msg = await save_message(session, req.user_id, req.query, full_reply, route.intent)
+                            enqueue_ledger_events(session, msg.id)
+                            await session.commit()
+                        after_message_commit(req.user_id, msg)
+                    except Exception:
+                        await session.rollback()
+                        user_ids.discard(req.user_id)
+                        raise
+
+                yield sse_event("done", {"message_id": str(msg.id), "record_hash": msg.record_hash})
+            except Rejected as e:
+                # Lost the race for a slot after the pre-check passed
+                yield sse_event("error", {"detail": str(e), "status": e.status, "retry_after": e.retry_after_header})
+            except Exception as e:
+                yield sse_event("error", {"detail": f"Internal error: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # ---------------------------------------------------------------------
 # 🩺 Health Check
 # ---------------------------------------------------------------------
 @app.get("/health")
 async def health_check():
-    return {"status": "running", "chat_model": "HuggingFace LLM", "database": "connected"}
+    return {
+        "status": "running",
+        "chat_model": "HuggingFace LLM",
+        "database": "connected",
+        "inference": chat_scheduler.stats(),
+        "models": registry.status(),
+        "reply_cache": reply_cache.stats(),
+        "coalescing": inflight.stats(),
+        "admission": admission.stats(),
+        "memory": memory.stats(),
+        "safety_filter": safety_filter.stats(),
+        "output_filter": output_filter.stats(),
+        "enrichment": enrichment.stats(),
+        "intent": intent_router.stats(),
+        "retrieval": retrieval_stats(),
+        "ledger_outbox": outbox_worker.stats() if outbox_worker else None,
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition: stage latency histograms, counters and gauges."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/db")
+async def db_pool_health():
+    """Connection pool usage: checked-out connections, waiters and checkout wait times."""
+    return pool_status()
 
 # ---------------------------------------------------------------------
 # 🏠 Root Route
@@ -0,0 +1,312 @@
+"""
+In-process metrics and request tracing, exposed on GET /metrics in the
+Prometheus text format.
+
+    from metrics import stage, STAGE_ERRORS
+
+    with stage("retrieve"):
+        context = retrieve_context(query)
+
+Three kinds of metric, all thread-safe and label-aware:
+
+- Counter: only goes up (`inc`)
+- Gauge: set directly, or read from a callback at scrape time (queue depth,
+  pool usage), so nothing has to be pushed on the hot path
+- Histogram: cumulative buckets plus _sum/_count (`observe`)
+
+Counters and gauges can also be backed by a callback returning either a
+number or `{label_values_tuple: number}`, which is how the existing stats()
+counters (reply cache, scheduler, ...) are exported without double counting.
+
+`stage(name)` times one pipeline stage into agroai_stage_seconds{stage=...}.
+Inside a `trace()` block it also records a span; with TRACE_LOG=true each
+finished trace is written as one JSON line (trace id, spans with offsets and
+durations) to the "agroai.trace" logger. There is no external dependency:
+the text format is small enough to write by hand.
+"""
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+TRACE_LOG = os.getenv("TRACE_LOG", "false").lower() == "true"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+
+# Seconds; generation dominates, so the buckets reach well past a second
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), fn: Callable | None = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> Iterable[Tuple[LabelValues, float]]:
+        if self.fn is None:
+            with self._lock:
+                return list(self._values.items())
+        value = self.fn()
+        if isinstance(value, dict):
+            return list(value.items())
+        return [((), value)] if value is not None else []
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in self.samples():
+            lines.append(f"{self.name}{_labels(self.labelnames, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> [bucket counts..., sum, count]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self) -> Dict[LabelValues, dict]:
+        """Per label set: count, sum and cumulative bucket counts."""
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        out = {}
+        for key, s in series.items():
+            cumulative, total = [], 0
+            for count in s[:-2]:
+                total += count
+                cumulative.append(total)
+            out[key] = {"count": s[-1], "sum": s[-2], "buckets": dict(zip(self.buckets, cumulative))}
+        return out
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, s in self.snapshot().items():
+            for bound, count in s["buckets"].items():
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {_format_value(s['sum'])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {s['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # One broken callback must not take the whole scrape down
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = (), fn: Callable | None = None) -> Counter:
+    return registry.register(Counter(name, help, labelnames, fn))
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = (), fn: Callable | None = None) -> Gauge:
+    return registry.register(Gauge(name, help, labelnames, fn))
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, help, labelnames, buckets))
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+# ------------------------------
+# ⏱️ Pipeline stages
+# ------------------------------
+STAGE_SECONDS = histogram(
+    "agroai_stage_seconds", "Time spent in each chat pipeline stage", ["stage"]
+)
+STAGE_ERRORS = counter(
+    "agroai_stage_errors_total", "Pipeline stages that raised", ["stage"]
+)
+MODEL_FALLBACKS = counter(
+    "agroai_model_fallbacks_total", "Replies served by a fallback instead of the configured model", ["reason"]
+)
+HTTP_SECONDS = histogram(
+    "agroai_http_request_seconds", "HTTP request latency by route", ["method", "route", "status"]
+)
+
+
+# ------------------------------
+# 🧵 Tracing
+# ------------------------------
+class Trace:
+    def __init__(self, name: str, attrs: dict):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.spans: List[dict] = []
+
+    def add_span(self, name: str, start: float, seconds: float, error: str | None = None):
+        span = {"name": name, "offset_ms": round(1000 * (start - self.start), 3), "ms": round(1000 * seconds, 3)}
+        if error:
+            span["error"] = error
+        self.spans.append(span)
+
+    def to_dict(self, status: str) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "ts": round(self.started_at, 6),
+            "ms": round(1000 * (time.perf_counter() - self.start), 3),
+            "status": status,
+            **self.attrs,
+            "spans": self.spans,
+        }
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("agroai_trace", default=None)
+
+trace_logger = logging.getLogger("agroai.trace")
+if not trace_logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    trace_logger.addHandler(_handler)
+    trace_logger.setLevel(logging.INFO)
+    trace_logger.propagate = False
+
+
+@contextmanager
+def trace(name: str, **attrs):
+    """Collect the stages run inside this block into one trace (logged if TRACE_LOG is on)."""
+    if not TRACE_LOG or random.random() >= TRACE_SAMPLE_RATE:
+        yield None
+        return
+    current = Trace(name, attrs)
+    token = _current_trace.set(current)
+    status = "ok"
+    try:
+        yield current
+    except BaseException as e:
+        status = type(e).__name__
+        raise
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # A streaming generator closed from another context (client went away)
+            _current_trace.set(None)
+        trace_logger.info(json.dumps(current.to_dict(status), ensure_ascii=False))
+
+
+@contextmanager
+def stage(name: str):
+    """Time one pipeline stage (histogram + span in the current trace)."""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=name)
+        current = _current_trace.get()
+        if current is not None:
+            current.add_span(name, start, seconds, error)
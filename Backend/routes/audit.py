@@ -1,13 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from db.session import get_session
-from db.models import Message, User
-from chatbot.utils import sha256_hex, canonical_record
+from db.session import get_session, AsyncSessionLocal
+from db.models import AnchorBatch, Message, User
+from chain.anchoring import verify_anchor
+from audit_verify import verify_messages, AUDIT_CHUNK_SIZE
+from hashing import HASH_VERSION, record_hash
 
 router = APIRouter()
 
+@router.get("/verify")
+async def verify(
+    since: datetime | None = Query(None, description="Only messages created at or after this time"),
+    until: datetime | None = Query(None, description="Only messages created before this time"),
+    user_id: str | None = Query(None, description="External user id"),
+    chunk_size: int = Query(AUDIT_CHUNK_SIZE, ge=100, le=50_000),
+):
+    """
+    Bulk hash verification as NDJSON: one line per mismatching message,
+    then a summary line with counts and throughput (or an error line if the
+    hashing pool broke).
+    """
+    async def report():
+        # Own session: the stream outlives the request-scoped dependency
+        async with AsyncSessionLocal() as session:
+            async for line in verify_messages(session, since, until, user_id, chunk_size):
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(report(), media_type="application/x-ndjson")
+
 @router.get("/audit/{message_id}")
 async def audit(message_id: str, session: AsyncSession = Depends(get_session)):
     result = await session.execute(select(Message).where(Message.id == message_id))
@@ -17,18 +43,21 @@ async def audit(message_id: str, session: AsyncSession = Depends(get_session)):
 
     user = await session.get(User, msg.user_id)
 
-    canon = canonical_record(
+    recomputed = record_hash(
         user_id=user.external_id,
         query=msg.query,
-        reply=msg.reply
+        reply=msg.reply,
+        version=msg.hash_version or HASH_VERSION
     )
-    recomputed = sha256_hex(canon)
+    batch = await session.get(AnchorBatch, msg.anchor_batch_id) if msg.anchor_batch_id else None
 
     return {
         "message_id": msg.id,
         "db_hash": msg.record_hash,
         "recomputed_hash": recomputed,
         "hash_matches": msg.record_hash == recomputed,
+        "hash_version": msg.hash_version or HASH_VERSION,
         "fabric_tx_id": msg.fabric_tx_id,
-        "polygon_tx_hash": msg.polygon_tx_hash
+        "polygon_tx_hash": msg.polygon_tx_hash,
+        "anchor": verify_anchor(msg, batch)
     }
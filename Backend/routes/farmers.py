@@ -1,17 +1,90 @@
-from fastapi import APIRouter, Depends
+import csv
+import io
+import json
+import re
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from starlette.concurrency import iterate_in_threadpool
 from db.models import Farmer
-from db.session import get_session
+from db.session import get_session, AsyncSessionLocal, dialect_insert
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 500
+EXPORT_FETCH_SIZE = 1000
+BULK_CHUNK_SIZE = 1000
+MAX_BULK_CHUNK_SIZE = 5000  # 3 params per row, well under PostgreSQL's 32767 bind limit
+MAX_REJECTED_REPORTED = 1000
+PHONE_PATTERN = re.compile(r"^\+?\d{10,15}$")
+
+FARMER_COLUMNS = {
+    "farmer_id": Farmer.farmer_id,
+    "name": Farmer.name,
+    "location": Farmer.location,
+    "phone": Farmer.phone,
+}
+
+
+def _columns(fields: str | None) -> list:
+    """Requested columns; farmer_id is always included because it is the cursor."""
+    if not fields:
+        return list(FARMER_COLUMNS.values())
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [n for n in names if n not in FARMER_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}")
+    return [Farmer.farmer_id] + [FARMER_COLUMNS[n] for n in names if n != "farmer_id"]
+
+
+def _listing(columns: list, after: int | None, location: str | None):
+    stmt = select(*columns).order_by(Farmer.farmer_id)
+    if location is not None:
+        stmt = stmt.where(Farmer.location == location)
+    if after is not None:
+        stmt = stmt.where(Farmer.farmer_id > after)
+    return stmt
+
+
 @router.get("/farmers")
-async def get_farmers(session: AsyncSession = Depends(get_session)):
-    result = await session.execute(select(Farmer))
-    farmers = result.scalars().all()
+async def get_farmers(
+    response: Response,
+    after: int | None = Query(None, description="Return farmers with farmer_id greater than this cursor"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    location: str | None = None,
+    fields: str | None = Query(None, description="Comma-separated columns, e.g. name,phone"),
+    session: AsyncSession = Depends(get_session),
+):
+    """One keyset page of farmers. The next page's cursor is sent in the X-Next-Cursor header."""
+    stmt = _listing(_columns(fields), after, location).limit(limit)
+    farmers = [dict(row) for row in (await session.execute(stmt)).mappings()]
+    if len(farmers) == limit:
+        response.headers["X-Next-Cursor"] = str(farmers[-1]["farmer_id"])
     return farmers
 
+
+@router.get("/farmers/export")
+async def export_farmers(
+    location: str | None = None,
+    fields: str | None = Query(None, description="Comma-separated columns, e.g. name,phone"),
+):
+    """
+    Whole (optionally filtered) registry as NDJSON, one farmer per line.
+    Rows come from a server-side cursor, so memory stays flat however large the table is.
+    """
+    stmt = _listing(_columns(fields), None, location).execution_options(yield_per=EXPORT_FETCH_SIZE)
+
+    async def rows():
+        # Own session: the stream outlives the request-scoped dependency
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(stmt)
+            async for row in result.mappings():
+                yield json.dumps(dict(row), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
 @router.post("/farmers")
 async def create_farmer(name: str, location: str, phone: str, session: AsyncSession = Depends(get_session)):
     farmer = Farmer(name=name, location=location, phone=phone)
@@ -19,3 +92,115 @@ async def create_farmer(name: str, location: str, phone: str, session: AsyncSess
     await session.commit()
     await session.refresh(farmer)
     return farmer
+
+
+# ---------------------------------------------------------------------
+# 📥 Bulk import
+# ---------------------------------------------------------------------
+def _validate_farmer(record: dict) -> dict:
+    # NDJSON values may be numbers, lists, ...: only strings are accepted
+    name, location = record.get("name"), record.get("location")
+    if not isinstance(name, (str, type(None))) or not isinstance(location, (str, type(None))):
+        raise ValueError("name and location must be strings")
+    name = (name or "").strip()
+    location = (location or "").strip() or None
+    phone = re.sub(r"[\s\-()]", "", str(record.get("phone") or ""))
+    if not name:
+        raise ValueError("name is required")
+    if len(name) > 100:
+        raise ValueError("name longer than 100 characters")
+    if location and len(location) > 150:
+        raise ValueError("location longer than 150 characters")
+    if not PHONE_PATTERN.match(phone):
+        raise ValueError("phone must be 10-15 digits")
+    return {"name": name, "location": location, "phone": phone}
+
+
+def _records(upload, fmt: str):
+    """(line number, record | parse error) pairs from the uploaded file."""
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                record = ValueError(f"invalid JSON: {e.msg}")
+            else:
+                if not isinstance(record, dict):
+                    record = ValueError("expected a JSON object")
+            yield line_no, record
+
+
+def _validated_chunks(upload, fmt: str, chunk_size: int):
+    """Parse and validate in a streaming fashion, yielding (rows, rejected) per chunk."""
+    rows, rejected, phones = [], [], set()
+    for line_no, record in _records(upload, fmt):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            farmer = _validate_farmer(record)
+            if farmer["phone"] in phones:
+                raise ValueError("duplicate phone within upload chunk")
+            phones.add(farmer["phone"])
+            rows.append(farmer)
+        except ValueError as e:
+            rejected.append({"line": line_no, "error": str(e)})
+        if len(rows) + len(rejected) >= chunk_size:
+            yield rows, rejected
+            rows, rejected, phones = [], [], set()
+    if rows or rejected:
+        yield rows, rejected
+
+
+# Mounted under prefix="/farmers", so this is POST /farmers/bulk
+@router.post("/bulk")
+async def bulk_import_farmers(
+    file: UploadFile = File(...),
+    format: str | None = Query(None, pattern="^(csv|ndjson)$", description="Defaults from the file name"),
+    chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=MAX_BULK_CHUNK_SIZE),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Import farmers from a CSV (name,location,phone header) or NDJSON upload.
+    Rows are validated while streaming and written one multi-row
+    INSERT ... ON CONFLICT (phone) DO NOTHING per chunk; each chunk is
+    committed on its own, so a bad row never sinks the rest of the file.
+    """
+    fmt = format or ("ndjson" if (file.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv")
+    insert = dialect_insert(session)
+
+    chunks, rejected_rows = [], []
+    totals = {"rows": 0, "inserted": 0, "duplicates": 0, "rejected": 0}
+    # Parsing reads the spooled upload synchronously, so it runs on the threadpool
+    async for rows, rejected in iterate_in_threadpool(_validated_chunks(file.file, fmt, chunk_size)):
+        inserted = 0
+        if rows:
+            stmt = insert(Farmer).values(rows).on_conflict_do_nothing(index_elements=["phone"]).returning(Farmer.farmer_id)
+            inserted = len((await session.execute(stmt)).all())
+            await session.commit()
+
+        report = {
+            "chunk": len(chunks) + 1,
+            "rows": len(rows) + len(rejected),
+            "inserted": inserted,
+            "duplicates": len(rows) - inserted,
+            "rejected": len(rejected),
+        }
+        chunks.append(report)
+        for key in totals:
+            totals[key] += report[key]
+        rejected_rows.extend(rejected[:MAX_REJECTED_REPORTED - len(rejected_rows)])
+
+    return {
+        "format": fmt,
+        "totals": totals,
+        "chunks": chunks,
+        "rejected_rows": rejected_rows,
+        "rejected_rows_truncated": totals["rejected"] > len(rejected_rows),
+    }
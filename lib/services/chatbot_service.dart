@@ -30,19 +30,71 @@ class ChatbotService {
     }
   }
 
-  // Method to get chat history if your backend supports it
-  static Future<List<Map<String, String>>> getChatHistory() async {
+  // Streams the reply from /chat/stream (Server-Sent Events), emitting the
+  // text received so far after every token so the UI can render incrementally.
+  static Stream<String> streamMessage(String message) async* {
+    final client = http.Client();
+    try {
+      final request = http.Request('POST', Uri.parse('$baseUrl/chat/stream'))
+        ..headers['Content-Type'] = 'application/json'
+        ..headers['Accept'] = 'text/event-stream'
+        ..body = jsonEncode({
+          "user_id": "demo_user",
+          "query": message,
+        });
+      final response = await client.send(request);
+      if (response.statusCode != 200) {
+        yield 'Sorry, I\'m having trouble connecting right now. Please try again later.';
+        return;
+      }
+
+      final buffer = StringBuffer();
+      String event = 'message';
+      await for (final line in response.stream
+          .transform(utf8.decoder)
+          .transform(const LineSplitter())) {
+        if (line.startsWith('event:')) {
+          event = line.substring(6).trim();
+        } else if (line.startsWith('data:')) {
+          final data = jsonDecode(line.substring(5).trim());
+          if (event == 'token') {
+            buffer.write(data['text'] ?? '');
+            yield buffer.toString();
+          } else if (event == 'error') {
+            yield 'Sorry, I\'m having trouble connecting right now. Please try again later.';
+            return;
+          }
+        }
+      }
+    } catch (e) {
+      yield 'Sorry, I\'m having trouble connecting right now. Please try again later.';
+    } finally {
+      client.close();
+    }
+  }
+
+  // Most recent conversation from /chat/history (newest first on the wire),
+  // returned oldest first as the {'sender', 'text'} maps the chat screen renders.
+  static Future<List<Map<String, String>>> getChatHistory({int limit = 50}) async {
     try {
       final response = await http.get(
-        Uri.parse('$baseUrl/chat/history'),
+        Uri.parse('$baseUrl/chat/history').replace(queryParameters: {
+          'user_id': 'demo_user',
+          'limit': '$limit',
+        }),
         headers: {
           // Add authentication headers if needed
         },
       );
 
       if (response.statusCode == 200) {
-        final data = jsonDecode(response.body);
-        return data['answer'] ?? 'No answer from backend.';
+        final List<dynamic> data = jsonDecode(utf8.decode(response.bodyBytes));
+        final messages = <Map<String, String>>[];
+        for (final item in data.reversed) {
+          messages.add({'sender': 'user', 'text': item['query'] ?? ''});
+          messages.add({'sender': 'ai', 'text': item['reply'] ?? ''});
+        }
+        return messages;
       } else {
         return [];
       }